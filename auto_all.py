@@ -136,42 +136,768 @@ Combining the two approaches
 
     The ``__all__`` variable will include any object declared between the
     ``start_all`` and ``end_all`` calls, and any function decorated with the
-    ``@public`` decorator:
+    ``@public`` decorator, in the order they were defined:
 
-        >>> print(sorted(__all__))
+        >>> print(__all__)
         ['PUBLIC_VARIABLE', 'PublicClass', 'public_function']
 
+Audit events
+============
+
+    ``start_all``, ``end_all``, ``public``, ``public_many`` and ``auto_all``
+    raise audit events (PEP 578) named ``auto_all.<function>``. Their
+    arguments are the module name and the number of names the call added
+    to ``__all__``. For ``end_all(lazy=True)`` the number is ``None``, as
+    the names are not known yet. Raising an event is cheap when no audit
+    hook is installed.
+
+Import cost
+===========
+
+    Importing auto_all only loads ``sys``. Heavier standard library modules
+    are imported lazily, on the rare code paths that need them.
+
 """
-import inspect
-from typing import Callable
-from typing import Dict, Optional
+import sys
 _GLOBAL_VAR_NAME = '_do_not_include_all'
 
 
+def _fallback_getframe(depth: int = 0):
+    """Return the frame ``depth`` levels above the caller.
+
+    Used on interpreters that do not provide ``sys._getframe``. The caller's
+    frame is taken from the traceback of a raised exception and the stack is
+    then walked one ``f_back`` at a time, so only ``depth`` frames are
+    visited.
+
+        >>> def caller():
+        ...     return _fallback_getframe(0).f_code.co_name
+        >>> caller()
+        'caller'
+
+        >>> def outer():
+        ...     return inner()
+        >>> def inner():
+        ...     return _fallback_getframe(1).f_code.co_name
+        >>> outer()
+        'outer'
+
+        >>> _fallback_getframe(0) is sys._getframe(0)
+        True
+    """
+    try:
+        raise Exception
+    except Exception:
+        frame = sys.exc_info()[2].tb_frame.f_back
+
+    for _ in range(depth):
+        frame = frame.f_back
+
+    return frame
+
+
+_getframe = getattr(sys, '_getframe', _fallback_getframe)
+
+
+def _get_caller_globals(depth: int):
+    """Get the globals dict of the frame ``depth`` levels above the caller.
+
+    Unlike ``inspect.stack()`` this does not build frame records or read
+    source lines for the whole stack, so the cost does not depend on stack
+    depth.
+
+        >>> def get_globals():
+        ...     return _get_caller_globals(1)
+        >>> get_globals() is globals()
+        True
+
+    This only inspects the calling frames, so no source files are read and
+    ``linecache`` is left untouched.
+    """
+    return _getframe(depth + 1).f_globals
+
+
 def _get_globals():
     """Get global dict from stack."""
-    calling_module = inspect.stack()[2]
-    local_stack = calling_module[0]
-    return local_stack.f_globals
+    return _get_caller_globals(2)
+
+
+class PublicNames(list):
+    """A list of public names that never contains duplicates.
+
+    auto_all stores ``__all__`` as a ``PublicNames`` list. It behaves like a
+    normal list for consumers, but keeps a set of its items alongside, so
+    adding a name that is already present does nothing and membership checks
+    don't scan the list. This keeps ``__all__`` free of duplicates when a
+    module is reloaded or a function is defined more than once.
+
+        >>> names = PublicNames(['a_function', 'AClass'])
+        >>> names.append('a_function')
+        >>> names.extend(['AClass', 'A_CONSTANT'])
+        >>> names
+        ['a_function', 'AClass', 'A_CONSTANT']
+        >>> 'AClass' in names
+        True
+        >>> names.remove('AClass')
+        >>> 'AClass' in names
+        False
+
+    Once a module has been imported, ``freeze`` gives an immutable copy with
+    interned names:
+
+        >>> names.freeze()
+        ('a_function', 'A_CONSTANT')
+    """
+
+    __slots__ = ('_names',)
+
+    def __init__(self, iterable: 'Iterable[str]' = ()):
+        super().__init__()
+        self._names = set()
+        self.extend(iterable)
+
+    def __reduce__(self):
+        return type(self), (list(self),)
+
+    def __contains__(self, name) -> bool:
+        return name in self._names
+
+    def append(self, name: str):
+        if name not in self._names:
+            self._names.add(name)
+            super().append(name)
+
+    def extend(self, names: 'Iterable[str]'):
+        for name in names:
+            self.append(name)
+
+    def __iadd__(self, names: 'Iterable[str]') -> 'PublicNames':
+        self.extend(names)
+        return self
+
+    def __imul__(self, count: int) -> 'PublicNames':
+        if count <= 0:
+            self.clear()
+        return self
+
+    def insert(self, index: int, name: str):
+        if name not in self._names:
+            self._names.add(name)
+            super().insert(index, name)
+
+    def remove(self, name: str):
+        super().remove(name)
+        self._names.discard(name)
+
+    def pop(self, index: int = -1) -> str:
+        name = super().pop(index)
+        self._names.discard(name)
+        return name
+
+    def clear(self):
+        super().clear()
+        self._names.clear()
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self._rebuild()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._rebuild()
+
+    def _rebuild(self):
+        """Restore the set and remove duplicates after an item assignment.
+        """
+        names = list(self)
+        super().clear()
+        self._names.clear()
+        self.extend(names)
+
+    def freeze(self) -> 'Tuple[str, ...]':
+        """Return the names as a tuple of interned strings."""
+        return tuple(sys.intern(name) if type(name) is str else name
+                     for name in self)
+
+
+class _Block:
+    """Bookkeeping for a ``start_all``/``end_all`` block.
+
+    Stored in the module globals under ``_GLOBAL_VAR_NAME`` while the block
+    is being defined. The key is inserted last when the block starts, so it
+    marks the boundary between existing names and names defined in the
+    block in the insertion order of the globals dict.
+    """
+
+    __slots__ = ('policy', 'lazy', 'started')
+
+    def __init__(self, policy=None):
+        # Predicate selecting the public names, from ``_name_policy``.
+        self.policy = policy
+        # Names declared with ``lazy_public`` in the block.
+        self.lazy = []
+        # When the block started, if profiling is enabled.
+        self.started = None
+
+
+_policy_cache = {}
+
+
+def _compile_rules(rules: 'Iterable') -> 'Callable':
+    """Compile include or exclude rules into a single predicate.
+
+    Glob patterns are combined into one regular expression, so a name is
+    matched against all of them in a single call.
+    """
+    glob_patterns = []
+    patterns = []
+    types = []
+    predicates = []
+    for rule in rules:
+        if isinstance(rule, str):
+            glob_patterns.append(rule)
+        elif hasattr(rule, 'search') and hasattr(rule, 'pattern'):
+            patterns.append(rule)
+        elif isinstance(rule, type) or (
+                isinstance(rule, tuple)
+                and all(isinstance(item, type) for item in rule)):
+            types.append(rule)
+        elif callable(rule):
+            predicates.append(rule)
+        else:
+            raise TypeError('invalid name rule: {!r}'.format(rule))
+
+    if glob_patterns:
+        import fnmatch
+        import re
+        glob_match = re.compile('|'.join(
+            '(?:{})'.format(fnmatch.translate(pattern))
+            for pattern in glob_patterns)).match
+    else:
+        glob_match = None
+
+    def matches(name, obj):
+        return bool(
+            (glob_match is not None and glob_match(name))
+            or any(pattern.search(name) for pattern in patterns)
+            or any(isinstance(obj, type_) for type_ in types)
+            or any(predicate(name, obj) for predicate in predicates))
+
+    return matches
+
+
+def _rule_tuple(rules) -> 'Tuple':
+    """Return a single rule, or an iterable of rules, as a tuple of rules.
+
+        >>> _rule_tuple('test_*')
+        ('test_*',)
+        >>> _rule_tuple(int)
+        (<class 'int'>,)
+        >>> _rule_tuple(['test_*', int])
+        ('test_*', <class 'int'>)
+    """
+    if (isinstance(rules, (str, type)) or callable(rules)
+            or hasattr(rules, 'pattern')):
+        return (rules,)
+    return tuple(rules)
+
+
+def _name_policy(include=None, exclude=None,
+                 exclude_private: bool = False) -> 'Optional[Callable]':
+    """Build a predicate that selects public names, or ``None`` for all.
+
+    Policies are cached, so the rules passed by each module are only
+    compiled once per process.
+    """
+    if include is None and exclude is None and not exclude_private:
+        return None
+    include = None if include is None else _rule_tuple(include)
+    exclude = () if exclude is None else _rule_tuple(exclude)
+
+    key = (include, exclude, exclude_private)
+    try:
+        return _policy_cache[key]
+    except KeyError:
+        pass
+    except TypeError:
+        key = None
+
+    included = None if include is None else _compile_rules(include)
+    excluded = _compile_rules(exclude) if exclude else None
+
+    def policy(name, obj):
+        if exclude_private and name[:1] == '_':
+            return False
+        if included is not None and not included(name, obj):
+            return False
+        return excluded is None or not excluded(name, obj)
+
+    if key is not None:
+        _policy_cache[key] = policy
+    return policy
+
+
+_cache_directory = None
+_cache_max_entries = 4096
+_cache_env_checked = False
+_cache_writes = 0
+
+
+def enable_cache(directory: 'Optional[str]' = None,
+                 max_entries: int = 4096):
+    """Cache the ``__all__`` lists that ``facade`` computes on disk.
+
+    ``facade`` reads and parses the source of every submodule it re-exports.
+    When the cache is enabled, the ``__all__`` found for each submodule is
+    stored in a file in ``directory``, keyed on a hash of the submodule's
+    source and on the Python version and platform. Later processes
+    importing the package read the unchanged submodules' ``__all__`` from
+    the cache instead of parsing them. The directory can be shared between
+    virtual environments and interpreters.
+
+    ``start_all`` and ``end_all`` are not cached, and never perform file
+    I/O: computing ``__all__`` for a block costs less than reading a cache
+    entry would.
+
+    The cache can also be enabled by setting the ``AUTO_ALL_CACHE_DIR``
+    environment variable to the cache directory.
+
+        >>> import os, tempfile
+        >>> tmp = tempfile.TemporaryDirectory()
+        >>> package = os.path.join(tmp.name, 'cached_pkg')
+        >>> os.mkdir(package)
+        >>> with open(os.path.join(package, '__init__.py'), 'w') as f:
+        ...     _ = f.write('import auto_all\\nauto_all.facade()\\n')
+        >>> with open(os.path.join(package, 'api.py'), 'w') as f:
+        ...     _ = f.write('__all__ = ["PUBLIC_VARIABLE"]\\n')
+
+        >>> enable_cache(os.path.join(tmp.name, 'cache'))
+        >>> sys.path.insert(0, tmp.name)
+        >>> import cached_pkg
+        >>> cached_pkg.__all__
+        ['PUBLIC_VARIABLE']
+        >>> len(os.listdir(os.path.join(tmp.name, 'cache')))
+        1
+
+        >>> disable_cache()
+        >>> _ = sys.path.remove(tmp.name)
+        >>> del sys.modules['cached_pkg']
+        >>> tmp.cleanup()
+
+    Args:
+        directory(str, optional): Directory to store the cache in. Defaults
+            to ``auto_all`` in the user cache directory.
+        max_entries(int, optional): Maximum number of submodules to keep in
+            the cache. The least recently written entries are removed first.
+    """
+    import os
+    global _cache_directory, _cache_max_entries, _cache_env_checked
+
+    if directory is None:
+        directory = os.path.join(
+            os.environ.get('XDG_CACHE_HOME')
+            or os.path.join(os.path.expanduser('~'), '.cache'),
+            'auto_all')
+
+    os.makedirs(directory, exist_ok=True)
+    _cache_directory = directory
+    _cache_max_entries = max_entries
+    _cache_env_checked = True
+
+
+def disable_cache():
+    """Stop reading and writing the on-disk ``facade`` cache."""
+    global _cache_directory, _cache_env_checked
+    _cache_directory = None
+    _cache_env_checked = True
+
+
+def _cache_entry(name: 'Optional[str]',
+                 filename: 'Optional[str]') -> 'Optional[Tuple[str, str]]':
+    """Return the cache file path and key for a module, if it can be cached.
+    """
+    global _cache_env_checked
+
+    if not _cache_env_checked:
+        import os
+        _cache_env_checked = True
+        if os.environ.get('AUTO_ALL_CACHE_DIR'):
+            enable_cache(os.environ['AUTO_ALL_CACHE_DIR'])
+
+    if _cache_directory is None:
+        return None
+
+    if not filename or not name:
+        return None
+
+    import hashlib
+    import os
+    import zlib
+    try:
+        with open(filename, 'rb') as f:
+            digest = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+    except OSError:
+        return None
+
+    # The cache directory may be shared between interpreters and platforms.
+    key = '{} {} {:x} {}'.format(digest, sys.platform, sys.hexversion,
+                                filename)
+    path = os.path.join(_cache_directory, '{}-{}-{:08x}'.format(
+        name, sys.implementation.cache_tag,
+        zlib.crc32(filename.encode('utf-8', 'surrogateescape'))))
+    return path, key
+
+
+def _cache_read(path: str, key: str) -> 'Optional[List]':
+    try:
+        with open(path, encoding='utf-8') as f:
+            lines = f.read().split('\n')
+    except (OSError, ValueError):
+        return None
+    if lines[0] != key:
+        return None
+    return lines[1:-1]
+
+
+def _cache_write(path: str, key: str, names: 'List'):
+    import os
+    global _cache_writes
+
+    if any('\n' in name for name in names):
+        return
+
+    temp = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        with open(temp, 'w', encoding='utf-8') as f:
+            f.write(''.join(line + '\n' for line in [key] + names))
+        os.replace(temp, path)
+    except OSError:
+        return
+
+    if _cache_writes % 256 == 0:
+        _cache_evict()
+    _cache_writes += 1
+
+
+def _cache_evict():
+    """Remove the oldest cache entries beyond the size limit."""
+    import os
+    try:
+        entries = [(entry.stat().st_mtime, entry.path)
+                   for entry in os.scandir(_cache_directory)]
+    except OSError:
+        return
+    if len(entries) <= _cache_max_entries:
+        return
+    entries.sort()
+    for _, path in entries[:len(entries) - _cache_max_entries]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+_profile_registry = None
+_profile_env_checked = False
+_profile_report_format = None
+_profile_atexit_registered = False
+
+
+def enable_profiling(report: 'Optional[str]' = None):
+    """Record how much import time auto_all accounts for in each module.
+
+    While profiling is enabled, each call to ``start_all``, ``end_all``,
+    ``public``, ``public_many``, ``auto_all`` and ``freeze_all`` is timed,
+    along with the time spent executing the code between ``start_all`` and
+    ``end_all``. The statistics are kept per module name, and can be read
+    with ``profile_stats`` or formatted with ``profile_report``.
+
+        >>> import types
+        >>> enable_profiling()
+        >>> module = types.ModuleType('profiled')
+        >>> start_all(vars(module))
+        >>> module.PUBLIC_VARIABLE = 'I am public'
+        >>> end_all(vars(module))
+
+        >>> stats = profile_stats()['profiled']
+        >>> stats['calls'], stats['names']
+        (2, 1)
+        >>> stats['auto_all_time'] > 0, stats['block_time'] > 0
+        (True, True)
+        >>> print(profile_report(), end='')  # doctest: +ELLIPSIS
+        module    calls  auto_all ms  block ms  names
+        profiled      2  ...      1
+        >>> disable_profiling()
+
+    Profiling can also be enabled by setting the ``AUTO_ALL_PROFILE``
+    environment variable, in which case a report is written to stderr when
+    the interpreter exits. Set it to ``json`` for a JSON report, or to any
+    other non-empty value for a text report.
+
+    Args:
+        report(str, optional): Write a report to stderr at exit, either
+            ``'text'`` or ``'json'``.
+    """
+    global _profile_registry, _profile_env_checked, _profile_report_format
+    global _profile_atexit_registered
+
+    if report not in (None, 'text', 'json'):
+        raise ValueError('Unknown report format: {!r}'.format(report))
+
+    if _profile_registry is None:
+        _profile_registry = {}
+    _profile_env_checked = True
+    _profile_report_format = report
+
+    if report is not None and not _profile_atexit_registered:
+        import atexit
+        atexit.register(_profile_exit)
+        _profile_atexit_registered = True
+
 
+def disable_profiling():
+    """Stop profiling and discard the recorded statistics."""
+    global _profile_registry, _profile_env_checked, _profile_report_format
+    _profile_registry = None
+    _profile_env_checked = True
+    _profile_report_format = None
 
-def start_all(globs: Optional[Dict] = None):
+
+def profile_stats() -> 'Dict[str, Dict]':
+    """Return the statistics recorded while profiling, by module name.
+
+    Each module maps to a dict with:
+
+    * ``calls``: the number of auto_all calls made by the module,
+    * ``auto_all_time``: seconds spent in those calls,
+    * ``block_time``: seconds spent executing ``start_all``/``end_all``
+      blocks, excluding the calls themselves,
+    * ``names``: the size of ``__all__`` after the last call, or ``None``
+      if it had not been computed yet.
+
+    An empty dict is returned if profiling is not enabled.
+    """
+    if _profile_registry is None:
+        return {}
+    return {name: dict(stats) for name, stats in _profile_registry.items()}
+
+
+def profile_report(format: str = 'text') -> str:
+    """Format the statistics recorded while profiling.
+
+    Modules are listed by descending time spent in auto_all calls.
+
+    Args:
+        format(str, optional): ``'text'`` for a table, or ``'json'``.
+    """
+    stats = profile_stats()
+    if format == 'json':
+        import json
+        return json.dumps(stats, indent=2, sort_keys=True)
+    if format != 'text':
+        raise ValueError('Unknown report format: {!r}'.format(format))
+
+    width = max([len('module')] + [len(name) for name in stats])
+    lines = ['{:<{}}  {:>5}  {:>11}  {:>8}  {:>5}'.format(
+        'module', width, 'calls', 'auto_all ms', 'block ms', 'names')]
+    for name, module in sorted(stats.items(),
+                               key=lambda item: -item[1]['auto_all_time']):
+        lines.append('{:<{}}  {:>5}  {:>11.3f}  {:>8.3f}  {:>5}'.format(
+            name, width, module['calls'], module['auto_all_time'] * 1000,
+            module['block_time'] * 1000,
+            '-' if module['names'] is None else module['names']))
+    return ''.join(line + '\n' for line in lines)
+
+
+def _profile_exit():
+    if _profile_registry is not None and _profile_report_format is not None:
+        sys.stderr.write(profile_report(_profile_report_format))
+
+
+def _profile_clock() -> 'Optional[float]':
+    """Return the current time if profiling is enabled, otherwise ``None``.
+    """
+    global _profile_env_checked
+
+    if not _profile_env_checked:
+        import os
+        _profile_env_checked = True
+        report = os.environ.get('AUTO_ALL_PROFILE')
+        if report:
+            enable_profiling('json' if report == 'json' else 'text')
+
+    if _profile_registry is None:
+        return None
+
+    import time
+    return time.perf_counter()
+
+
+def _profile_record(globs: 'Dict', started: float,
+                    block_time: float = 0.0) -> float:
+    """Record an auto_all call that started at ``started`` for a module.
+
+    Returns the time the call finished.
+    """
+    import time
+    finished = time.perf_counter()
+    if _profile_registry is None:
+        return finished
+
+    name = globs.get('__name__')
+    stats = _profile_registry.get(name)
+    if stats is None:
+        stats = _profile_registry[name] = {
+            'calls': 0, 'auto_all_time': 0.0, 'block_time': 0.0,
+            'names': None}
+    stats['calls'] += 1
+    stats['auto_all_time'] += finished - started
+    stats['block_time'] += block_time
+    if '__all__' in globs:
+        stats['names'] = len(globs['__all__'])
+    return finished
+
+
+def start_all(globs: 'Optional[Dict]' = None, include=None, exclude=None,
+              exclude_private: bool = False):
     """Start defining externally accessible objects.
 
     Call ``start_all(globals())`` when you want to start defining objects
     in your module that you want to be accessible from outside the module.
 
+    The names defined in the block can be filtered with ``include`` and
+    ``exclude`` rules. Each rule can be:
+
+    * a glob pattern string, such as ``'test_*'``,
+    * a compiled regular expression, which is searched for in the name,
+    * a type, or tuple of types, matched against the object with
+      ``isinstance``,
+    * a callable taking ``(name, obj)`` and returning a bool.
+
+    A name is public if it matches any ``include`` rule (when given) and no
+    ``exclude`` rule. The rules are compiled once per process, and applied
+    in the same pass that computes ``__all__``.
+
+        >>> import re
+        >>> del __all__  # Delete __all__ for demo purposes
+        >>> start_all(exclude=['test_*', re.compile('Alias$'), type],
+        ...           exclude_private=True)
+        >>> def a_public_function():
+        ...     pass
+        >>> def test_a_public_function():
+        ...     pass
+        >>> class APublicClass:
+        ...     pass
+        >>> IntAlias = int
+        >>> _PRIVATE_VARIABLE = 'I am private'
+        >>> end_all()
+        >>> print(__all__)
+        ['a_public_function']
+
     Args:
         globs(dict, optional): Pass the globals dictionary to the function
             using ``globals()``.
+        include(optional): Rule, or iterable of rules, that public names
+            must match.
+        exclude(optional): Rule, or iterable of rules, for names to leave
+            out of ``__all__``.
+        exclude_private(bool, optional): Leave out names starting with an
+            underscore.
     """
+    started = _profile_clock()
     if not globs:
         globs = _get_globals()
 
-    globs[_GLOBAL_VAR_NAME] = list(globs.keys()) + [_GLOBAL_VAR_NAME]
+    # Remove any previous marker so the new one is the last key.
+    globs.pop(_GLOBAL_VAR_NAME, None)
+
+    block = _Block(_name_policy(include, exclude, exclude_private))
+    globs[_GLOBAL_VAR_NAME] = block
 
+    sys.audit('auto_all.start_all', globs.get('__name__'), 0)
 
-def end_all(globs: Optional[Dict] = None):
+    if started is not None:
+        block.started = _profile_record(globs, started)
+
+
+def _lazy_attributes(globs: 'Dict') -> 'Dict':
+    """Return the lazily computed attributes of a module.
+
+    A module level ``__getattr__`` (PEP 562) is installed the first time
+    this is called for a module. Factories added to the returned dict are
+    called on first access to their attribute, and the result is stored in
+    the module globals so later lookups don't reach ``__getattr__``. An
+    existing ``__getattr__`` defined by the module is called for any other
+    names.
+    """
+    current = globs.get('__getattr__')
+    attributes = getattr(current, '_auto_all_lazy', None)
+    if attributes is not None:
+        return attributes
+
+    attributes = {}
+
+    def __getattr__(name):
+        try:
+            factory = attributes[name]
+        except KeyError:
+            if current is not None:
+                return current(name)
+            raise AttributeError('module {!r} has no attribute {!r}'.format(
+                globs.get('__name__'), name)) from None
+        value = factory()
+        globs[name] = value
+        attributes.pop(name, None)
+        return value
+
+    __getattr__._auto_all_lazy = attributes
+    globs['__getattr__'] = __getattr__
+    return attributes
+
+
+def _is_internal(globs: 'Dict', name: str) -> bool:
+    """Check whether a global is bookkeeping rather than a public name."""
+    if name in ('__all__', _GLOBAL_VAR_NAME):
+        return True
+    if name == '__getattr__':
+        return hasattr(globs[name], '_auto_all_lazy')
+    if name == '__dir__':
+        return hasattr(globs[name], '_auto_all_dir')
+    return False
+
+
+def _block_keys(globs: 'Dict') -> 'List':
+    """Return the names defined in a ``start_all``/``end_all`` block.
+
+    The globals are walked backwards from the most recently added name to
+    the block marker, so the cost is proportional to the number of names
+    defined in the block, not the size of the namespace. The marker is
+    removed, leaving nothing behind in the module globals.
+    """
+    keys = []
+    for name in reversed(globs.keys()):
+        if name == _GLOBAL_VAR_NAME:
+            break
+        if not _is_internal(globs, name):
+            keys.append(name)
+    keys.reverse()
+    globs.pop(_GLOBAL_VAR_NAME, None)
+    return keys
+
+
+def _block_names(globs: 'Dict', block: _Block,
+                 keys: 'List') -> 'PublicNames':
+    """Compute ``__all__`` from the names returned by ``_block_keys``."""
+    policy = block.policy
+    names = [name for name in keys if name in globs
+             and (policy is None or policy(name, globs[name]))]
+    names.extend(name for name in block.lazy if name not in names)
+    return PublicNames(names)
+
+
+def end_all(globs: 'Optional[Dict]' = None, lazy: bool = False,
+            freeze: bool = False, include=None, exclude=None,
+            exclude_private: bool = False, set_dir: bool = False):
     """Finish defining externally accessible objects.
 
     Call ``end_all(globals())`` when you have finished defining objects
@@ -180,32 +906,1988 @@ def end_all(globs: Optional[Dict] = None):
     be updated with the names of all objects that were created between the
     ``start_all`` and ``end_all`` funciton calls.
 
+    Names are listed in the order they were defined, so ``__all__`` is the
+    same on every run regardless of ``PYTHONHASHSEED``. The bookkeeping
+    used to track the block is removed from the module globals, so managed
+    modules retain nothing beyond ``__all__`` itself.
+
+    With ``lazy=True`` only the names defined in the block are recorded,
+    and the ``__all__`` list is computed on first access to ``__all__``
+    through a module level ``__getattr__``. Names deleted in the meantime
+    are left out. Modules whose ``__all__`` is never read never pay for
+    computing it.
+
+        >>> import types
+        >>> module = types.ModuleType('lazy_module')
+        >>> start_all(vars(module))
+        >>> module.PUBLIC_VARIABLE = 'I am public'
+        >>> end_all(vars(module), lazy=True)
+        >>> module.PRIVATE_VARIABLE = 'I am private'
+
+        >>> '__all__' in vars(module)
+        False
+        >>> module.__all__
+        ['PUBLIC_VARIABLE']
+
+    If ``__all__`` already exists when ``end_all`` is called, for example
+    because ``@public`` was used before it, ``__all__`` is computed
+    immediately.
+
+    With ``freeze=True``, ``__all__`` is stored as a tuple of interned
+    strings, which is cheaper to iterate and search than a list:
+
+        >>> start_all()
+        >>> PUBLIC_VARIABLE = 'I am public'
+        >>> end_all(freeze=True)
+        >>> __all__
+        ('PUBLIC_VARIABLE',)
+
     Args:
         globs(dict, optional): Pass the globals dictionary to the function
             using ``globals()``.
+        lazy(bool, optional): Defer computing ``__all__`` until it is first
+            accessed.
+        freeze(bool, optional): Store ``__all__`` as a tuple. Using
+            ``@public`` after ``end_all`` turns it back into a list.
+        include(optional): Rule, or iterable of rules, that public names
+            must match. See ``start_all``.
+        exclude(optional): Rule, or iterable of rules, for names to leave
+            out of ``__all__``. See ``start_all``. Rules passed to
+            ``end_all`` replace any passed to ``start_all``.
+        exclude_private(bool, optional): Leave out names starting with an
+            underscore.
+        set_dir(bool, optional): Make ``dir()`` on the module list only its
+            public names. See ``install_dir``.
     """
+    started = _profile_clock()
     if not globs:
         globs = _get_globals()
 
-    globs['__all__'] = list(
-        set(list(globs.keys())) - set(globs[_GLOBAL_VAR_NAME])
-    )
+    block = globs[_GLOBAL_VAR_NAME]
+    policy = _name_policy(include, exclude, exclude_private)
+    if policy is not None:
+        block.policy = policy
 
+    def compute(keys):
+        names = _block_names(globs, block, keys)
+        return names.freeze() if freeze else names
 
-def public(func: Callable):
-    """Decorator that adds a function to the modules __all__ list."""
+    if lazy and '__all__' not in globs:
+        keys = _block_keys(globs)
+        _lazy_attributes(globs)['__all__'] = lambda: compute(keys)
+        exported = None
+    else:
+        globs['__all__'] = compute(_block_keys(globs))
+        exported = len(globs['__all__'])
+
+    if set_dir:
+        _install_dir(globs)
+
+    sys.audit('auto_all.end_all', globs.get('__name__'), exported)
+
+    if started is not None:
+        block_time = 0.0
+        if block.started is not None:
+            block_time = started - block.started
+        _profile_record(globs, started, block_time)
+
+
+def _install_dir(globs: 'Dict'):
+    """Install a module ``__dir__`` that lists the public names.
+
+    The sorted names are cached, and only rebuilt when ``__all__`` is
+    replaced or changes length.
+    """
+    if hasattr(globs.get('__dir__'), '_auto_all_dir'):
+        return
+
+    cache = [None, 0, []]
+
+    def __dir__():
+        try:
+            all_var = globs['__all__']
+        except KeyError:
+            try:
+                all_var = globs['__getattr__']('__all__')
+            except (KeyError, AttributeError):
+                all_var = ()
+        if all_var is not cache[0] or len(all_var) != cache[1]:
+            cache[:] = [all_var, len(all_var), sorted(all_var)]
+        return list(cache[2])
+
+    __dir__._auto_all_dir = True
+    globs['__dir__'] = __dir__
+
+
+def install_dir(globs: 'Optional[Dict]' = None):
+    """Make ``dir()`` on a module list only its public names.
+
+    A module level ``__dir__`` (PEP 562) returning the names in ``__all__``
+    is installed, so tab completion and other introspection of large
+    modules only does work proportional to the public API. Use it in
+    modules that use ``@public``; modules using ``start_all``/``end_all``
+    can call ``end_all(set_dir=True)`` instead.
+
+        >>> import types
+        >>> module = types.ModuleType('dir_module')
+        >>> exec('''
+        ... from auto_all import public, install_dir
+        ...
+        ... def a_private_function():
+        ...     pass
+        ...
+        ... @public
+        ... def a_public_function():
+        ...     pass
+        ...
+        ... install_dir()
+        ... ''', vars(module))
+        >>> dir(module)
+        ['a_public_function']
+
+    Args:
+        globs(dict, optional): Pass the globals dictionary to the function
+            using ``globals()``.
+    """
+    if not globs:
+        globs = _get_globals()
+
+    _install_dir(globs)
+
+
+def lazy_public(name: str, factory: 'Callable[[], Any]',
+                globs: 'Optional[Dict]' = None):
+    """Declare a public name whose value is created on first access.
+
+    ``factory`` is called with no arguments the first time the name is
+    looked up on the module, through a module level ``__getattr__``, and
+    the result is stored in the module so later lookups are plain global
+    lookups. Use it for expensive module level constants, such as compiled
+    pattern tables or loaded data, that most processes never use.
+
+    The name is added to ``__all__``. Inside a ``start_all``/``end_all``
+    block it is added when ``end_all`` is called, after the names defined
+    in the block.
+
+        >>> import types
+        >>> module = types.ModuleType('lazy_constants')
+        >>> exec('''
+        ... from auto_all import start_all, end_all, lazy_public
+        ...
+        ... def build_table():
+        ...     print('Building table')
+        ...     return {'a': 1}
+        ...
+        ... start_all()
+        ... lazy_public('TABLE', build_table)
+        ... end_all()
+        ... ''', vars(module))
+        >>> module.__all__
+        ['TABLE']
+        >>> module.TABLE
+        Building table
+        {'a': 1}
+        >>> module.TABLE
+        {'a': 1}
+
+    Args:
+        name(str): The public name.
+        factory(callable): Called with no arguments to create the value.
+        globs(dict, optional): Pass the globals dictionary to the function
+            using ``globals()``.
+    """
+    if not globs:
+        globs = _get_globals()
 
-    local_stack = inspect.stack()[1][0]
+    _declare_lazy(globs, name, factory)
 
-    global_vars = local_stack.f_globals
 
-    if '__all__' not in global_vars:
-        global_vars['__all__'] = []
+def _declare_lazy(globs: 'Dict', name: str, factory: 'Callable[[], Any]'):
+    """Register a lazy attribute and add its name to ``__all__``."""
+    # An existing binding would hide the name from __getattr__.
+    globs.pop(name, None)
+    _lazy_attributes(globs)[name] = factory
 
-    all_var = global_vars['__all__']
+    block = globs.get(_GLOBAL_VAR_NAME)
+    if block is None:
+        _module_all(globs).append(name)
+    else:
+        block.lazy.append(name)
+
+
+def _import_factory(module: str, name: str,
+                    package: 'Optional[str]' = None) -> 'Callable[[], Any]':
+    """Return a factory that imports ``module`` and gets ``name`` from it.
+    """
+    def load():
+        from importlib import import_module
+        return getattr(import_module(module, package), name)
+    return load
+
+
+def public_from(module: str, *names: str, globs: 'Optional[Dict]' = None):
+    """Re-export names from another module without importing it yet.
+
+    This is a lazy version of ``from module import name`` for facade
+    modules. The names are added to ``__all__``, but ``module`` is only
+    imported the first time one of them is accessed, through a module level
+    ``__getattr__``. Relative module names are resolved against the calling
+    module's package.
+
+        >>> import types
+        >>> module = types.ModuleType('reexports')
+        >>> exec('''
+        ... from auto_all import start_all, end_all, public_from
+        ...
+        ... start_all()
+        ... public_from('json', 'dumps', 'loads')
+        ... end_all()
+        ... ''', vars(module))
+        >>> module.__all__
+        ['dumps', 'loads']
+        >>> 'dumps' in vars(module)
+        False
+        >>> module.dumps([1])
+        '[1]'
+
+    Args:
+        module(str): The module to import the names from, for example
+            ``'.heavy'`` or ``'package.heavy'``.
+        *names(str): The names to re-export.
+        globs(dict, optional): Pass the globals dictionary to the function
+            using ``globals()``.
+    """
+    if not globs:
+        globs = _get_globals()
+
+    package = globs.get('__package__')
+    for name in names:
+        _declare_lazy(globs, name, _import_factory(module, name, package))
+
+
+def freeze_all(globs: 'Optional[Dict]' = None):
+    """Convert a module's ``__all__`` into a tuple of interned strings.
+
+    Call ``freeze_all()`` at the end of a module that uses ``@public``, once
+    all public functions have been defined. Modules using
+    ``start_all``/``end_all`` can use ``end_all(freeze=True)`` instead.
+
+        >>> del __all__  # Delete __all__ for demo purposes
+        >>> @public
+        ... def a_public_function():
+        ...     pass
+        >>> freeze_all()
+        >>> __all__
+        ('a_public_function',)
+
+    Args:
+        globs(dict, optional): Pass the globals dictionary to the function
+            using ``globals()``.
+    """
+    started = _profile_clock()
+    if not globs:
+        globs = _get_globals()
+
+    globs['__all__'] = _module_all(globs).freeze()
+
+    if started is not None:
+        _profile_record(globs, started)
+
+
+def _module_all(globs: 'Dict') -> 'PublicNames':
+    """Return the ``__all__`` list of a module, creating it if needed.
+
+    An existing ``__all__`` list or tuple is replaced with an equivalent
+    ``PublicNames`` list.
+    """
+    try:
+        all_var = globs['__all__']
+    except KeyError:
+        attributes = getattr(globs.get('__getattr__'), '_auto_all_lazy', {})
+        if '__all__' in attributes:
+            all_var = globs['__getattr__']('__all__')
+        else:
+            all_var = PublicNames()
+
+    if not isinstance(all_var, PublicNames):
+        all_var = PublicNames(all_var)
+    globs['__all__'] = all_var
+    return all_var
+
+
+def public(func: 'Callable'):
+    """Decorator that adds a function to the modules __all__ list."""
+
+    started = _profile_clock()
+
+    global_vars = _get_caller_globals(1)
+
+    all_var = _module_all(global_vars)
+    size = len(all_var)
 
     all_var.append(func.__name__)
 
+    sys.audit('auto_all.public', global_vars.get('__name__'),
+              len(all_var) - size)
+
+    if started is not None:
+        _profile_record(global_vars, started)
+
     return func
 
-__all__ = ['start_all', 'end_all', 'public']
+
+def public_many(items: 'Iterable', globs: 'Optional[Dict]' = None):
+    """Bind many objects in a module and add them to its ``__all__`` list.
+
+    This is a batch version of ``@public`` for objects generated in a loop.
+    The calling module is looked up once, and ``__all__`` is a
+    ``PublicNames`` list, so each name is checked against it with a set
+    lookup and never listed twice.
+
+    Items are either objects with a ``__name__``, such as functions and
+    classes, or ``(name, obj)`` pairs:
+
+        >>> del __all__  # Delete __all__ for demo purposes
+        >>> def make_getter(field):
+        ...     def getter(record):
+        ...         return record[field]
+        ...     getter.__name__ = 'get_' + field
+        ...     return getter
+
+        >>> public_many(make_getter(field) for field in ('id', 'name'))
+        >>> public_many([('VERSION', '1.0'), ('get_id', get_id)])
+
+        >>> print(__all__)
+        ['get_id', 'get_name', 'VERSION']
+        >>> get_name({'name': 'auto_all'})
+        'auto_all'
+
+    Args:
+        items(iterable): The objects, or ``(name, obj)`` pairs, to export.
+        globs(dict, optional): Pass the globals dictionary to the function
+            using ``globals()``.
+    """
+    started = _profile_clock()
+    if not globs:
+        globs = _get_globals()
+
+    all_var = _module_all(globs)
+    size = len(all_var)
+    for item in items:
+        if isinstance(item, tuple):
+            name, obj = item
+        else:
+            name, obj = item.__name__, item
+        globs[name] = obj
+        all_var.append(name)
+
+    sys.audit('auto_all.public_many', globs.get('__name__'),
+              len(all_var) - size)
+
+    if started is not None:
+        _profile_record(globs, started)
+
+
+_FunctionType = type(_get_globals)
+
+
+def _defined_in(obj, module_name: str) -> bool:
+    """Return whether ``obj`` is a function or class defined in a module.
+
+    Decorated functions are recognised by the ``__module__`` that
+    ``functools.wraps`` copies onto the wrapper, so ``@functools.lru_cache``
+    and similar decorators don't hide a function from ``auto_all()``.
+    """
+    if isinstance(obj, (type, _FunctionType)):
+        return getattr(obj, '__module__', None) == module_name
+    return (callable(obj)
+            and getattr(obj, '__dict__', {}).get('__module__') == module_name)
+
+
+def auto_all(*constants: str, globs: 'Optional[Dict]' = None):
+    """Set ``__all__`` to the functions and classes defined in a module.
+
+    Call ``auto_all()`` once, at the bottom of a module. It makes a single
+    pass over the module globals and selects the functions and classes
+    whose ``__module__`` is the module itself, so imported objects are left
+    out without taking a snapshot of the namespace. Functions wrapped by
+    decorators that use ``functools.wraps`` are included too. Names starting
+    with an underscore are private and are skipped. Constants, and any other
+    names, can be listed explicitly. Names already in ``__all__``, for
+    example from ``@public``, are kept.
+
+        >>> import types
+        >>> module = types.ModuleType('single_call')
+        >>> exec('''
+        ... from pathlib import Path
+        ... from auto_all import auto_all
+        ...
+        ... VERSION = '1.0'
+        ...
+        ... def a_public_function():
+        ...     pass
+        ...
+        ... def _a_private_function():
+        ...     pass
+        ...
+        ... class PublicClass:
+        ...     pass
+        ...
+        ... auto_all('VERSION')
+        ... ''', vars(module))
+        >>> module.__all__
+        ['a_public_function', 'PublicClass', 'VERSION']
+
+    Args:
+        *constants(str): Extra names to include in ``__all__``.
+        globs(dict, optional): Pass the globals dictionary to the function
+            using ``globals()``.
+    """
+    started = _profile_clock()
+    if not globs:
+        globs = _get_globals()
+
+    module_name = globs.get('__name__')
+    all_var = _module_all(globs)
+    size = len(all_var)
+    for name, obj in list(globs.items()):
+        if name[:1] != '_' and _defined_in(obj, module_name):
+            all_var.append(name)
+    all_var.extend(constants)
+
+    sys.audit('auto_all.auto_all', module_name, len(all_var) - size)
+
+    if started is not None:
+        _profile_record(globs, started)
+
+
+class StaticAnalysisError(ValueError):
+    """Raised when ``__all__`` cannot be determined without running a module.
+    """
+
+
+# Names that exist in every module namespace before its code runs.
+_MODULE_DUNDERS = ('__name__', '__doc__', '__package__', '__loader__',
+                   '__spec__', '__file__', '__cached__', '__builtins__',
+                   '__annotations__')
+
+_AUTO_ALL_FUNCTIONS = ('start_all', 'end_all', 'public', 'freeze_all',
+                       'auto_all')
+
+# auto_all functions that can be resolved statically, but have runtime
+# effects beyond __all__, so modules using them cannot be rewritten.
+_RUNTIME_FUNCTIONS = ('lazy_public', 'public_from')
+
+# auto_all functions whose effect on __all__ depends on runtime values.
+_DYNAMIC_FUNCTIONS = ('public_many',)
+
+_KNOWN_FUNCTIONS = (_AUTO_ALL_FUNCTIONS + _RUNTIME_FUNCTIONS
+                    + _DYNAMIC_FUNCTIONS)
+
+# Decorators that return the decorated class, or a wrapper made with
+# functools.wraps, so auto_all() still sees the module's own definition.
+_TRANSPARENT_DECORATORS = frozenset([
+    'contextlib.asynccontextmanager', 'contextlib.contextmanager',
+    'dataclasses.dataclass', 'enum.unique', 'functools.cache',
+    'functools.lru_cache', 'functools.singledispatch',
+    'functools.total_ordering', 'typing.final', 'typing.runtime_checkable',
+])
+
+
+class _StaticAnalyser:
+    """Emulate auto_all over the top level statements of a module AST.
+
+    Statements are visited in order. Names bound at module level are
+    tracked in the order a module namespace would see them, and the
+    ``start_all``/``end_all`` calls and ``@public`` decorators are applied
+    to that simulated namespace the same way they would be at runtime.
+    Function and class bodies are never entered.
+
+    The bodies of ``if``, ``for``, ``while``, ``try`` and ``with``
+    statements may not run, so names bound in them are tracked as
+    conditionally bound, unless every alternative branch binds them.
+    Conditionally bound names can't be resolved in ``__all__``.
+    """
+
+    def __init__(self, filename: str = '<unknown>'):
+        import ast
+        self.ast = ast
+        self.filename = filename
+        # name -> (kind, lineno), in namespace insertion order
+        self.bound = dict.fromkeys(_MODULE_DUNDERS, ('variable', 0))
+        self.snapshot = None
+        self.policy = None
+        # Names declared with lazy_public() in the current block, or None
+        # outside a block.
+        self.lazy = None
+        self.records = None
+        # Names in ``records``, for constant time membership checks.
+        self.recorded = set()
+        # The first construct that can't be resolved outside a block, as
+        # ``(node, message)``. It is only an error if the module turns out
+        # to use auto_all.
+        self.unresolved = None
+        # Names bound in each enclosing conditional branch, name -> lineno.
+        self.branches = []
+        # Names that may or may not be bound, name -> lineno.
+        self.conditional = {}
+        # local name -> auto_all function name
+        self.aliases = {}
+        # local names bound to the auto_all module itself
+        self.modules = set()
+        # local name -> qualified name, for other absolute imports
+        self.imported = {}
+        # Names bound to values that auto_all() can't classify without
+        # running the module, name -> lineno.
+        self.opaque = {}
+        # Import statements of auto_all, and the start_all()/end_all()
+        # statements and @public decorators applied to the namespace.
+        self.imports = []
+        self.calls = []
+
+    def error(self, node, message: str):
+        lineno = node if isinstance(node, int) else getattr(node, 'lineno', 0)
+        raise StaticAnalysisError('{}:{}: {}'.format(
+            self.filename, lineno, message))
+
+    def check_bound(self, name: str):
+        """Raise if a name put in ``__all__`` is only conditionally bound.
+        """
+        if name in self.conditional:
+            self.error(self.conditional[name],
+                       'cannot resolve conditionally bound name {!r}'.format(
+                           name))
+
+    def unresolvable(self, node, message: str):
+        """Report a construct whose effect on the namespace is unknown.
+
+        Inside a ``start_all()``/``end_all()`` block this is an error.
+        Elsewhere it only matters if the module uses auto_all, which
+        ``result`` checks once the whole module has been visited.
+        """
+        if self.lazy is not None:
+            self.error(node, message)
+        if self.unresolved is None:
+            self.unresolved = (node, message)
+
+    def result(self) -> 'Optional[List]':
+        """Return the records, once every statement has been visited."""
+        if self.records is not None and self.unresolved is not None:
+            self.error(*self.unresolved)
+        return self.records
+
+    def auto_all_function(self, node) -> 'Optional[str]':
+        """Return the auto_all function name ``node`` refers to, if any."""
+        ast = self.ast
+        if isinstance(node, ast.Call):
+            node = node.func
+        if isinstance(node, ast.Name):
+            return self.aliases.get(node.id)
+        if (isinstance(node, ast.Attribute)
+                and isinstance(node.value, ast.Name)
+                and node.value.id in self.modules
+                and node.attr in _KNOWN_FUNCTIONS):
+            return node.attr
+        return None
+
+    def qualified_name(self, node) -> 'Optional[str]':
+        """Return the imported name, such as ``'functools.lru_cache'``, that
+        a decorator refers to. ``node`` can also be a list of the dotted
+        name's parts."""
+        ast = self.ast
+        if isinstance(node, list):
+            parts = node
+        else:
+            if isinstance(node, ast.Call):
+                node = node.func
+            parts = []
+            while isinstance(node, ast.Attribute):
+                parts.append(node.attr)
+                node = node.value
+            if not isinstance(node, ast.Name):
+                return None
+            parts.append(node.id)
+            parts.reverse()
+        if parts[0] not in self.imported:
+            return None
+        return '.'.join([self.imported[parts[0]]] + parts[1:])
+
+    def bind(self, name: str, kind: str, lineno: int,
+             opaque: bool = False):
+        if not self.branches:
+            self.conditional.pop(name, None)
+        elif name not in self.bound or name in self.conditional:
+            self.branches[-1][name] = lineno
+        self.bound[name] = (kind, lineno)
+        if opaque:
+            self.opaque[name] = lineno
+        else:
+            self.opaque.pop(name, None)
+        self.aliases.pop(name, None)
+        self.modules.discard(name)
+        self.imported.pop(name, None)
+
+    def bind_target(self, target, lineno: int, opaque: bool = True):
+        ast = self.ast
+        if isinstance(target, ast.Name):
+            self.bind(target.id, 'variable', lineno, opaque)
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for element in target.elts:
+                self.bind_target(element, lineno, opaque)
+        elif isinstance(target, ast.Starred):
+            self.bind_target(target.value, lineno, opaque)
+
+    def opaque_value(self, node) -> bool:
+        """Return whether an assigned value could be a function or class.
+        """
+        ast = self.ast
+        return not isinstance(node, (
+            ast.Constant, ast.JoinedStr, ast.List, ast.Tuple, ast.Set,
+            ast.Dict, ast.ListComp, ast.SetComp, ast.DictComp,
+            ast.GeneratorExp, ast.BinOp, ast.UnaryOp, ast.Compare))
+
+    def define(self, name: str, kind: str, lineno: int, decorators: 'List'):
+        """Bind a function or class definition.
+
+        ``decorators`` are the decorator nodes, or the parts of decorators
+        that are plain dotted names. Returns the ``@public`` decorators.
+        """
+        public = []
+        opaque = False
+        for decorator in decorators:
+            if isinstance(decorator, list):
+                if len(decorator) == 1:
+                    function = self.aliases.get(decorator[0])
+                elif (len(decorator) == 2 and decorator[0] in self.modules
+                      and decorator[1] in _KNOWN_FUNCTIONS):
+                    function = decorator[1]
+                else:
+                    function = None
+            else:
+                function = self.auto_all_function(decorator)
+            if function == 'public':
+                public.append(decorator)
+            elif (self.qualified_name(decorator)
+                  not in _TRANSPARENT_DECORATORS):
+                opaque = True
+        self.bind(name, kind, lineno, opaque)
+        if public and self.branches:
+            self.error(lineno, 'cannot resolve conditional @public')
+        if public:
+            self.add_public(name, kind, lineno)
+        return public
+
+    def bind_walrus(self, node):
+        """Bind names assigned with ``:=`` inside a module level expression.
+        """
+        ast = self.ast
+        pending = [node]
+        while pending:
+            current = pending.pop()
+            if isinstance(current, ast.NamedExpr):
+                self.bind_target(current.target, current.lineno)
+            if isinstance(current, (ast.Lambda, ast.FunctionDef,
+                                    ast.AsyncFunctionDef, ast.ClassDef)):
+                continue
+            pending.extend(ast.iter_child_nodes(current))
+
+    def add_public(self, name: str, kind: str, lineno: int):
+        if self.records is None:
+            self.records = []
+            self.recorded = set()
+            self.bound['__all__'] = ('variable', lineno)
+        if name not in self.recorded:
+            self.records.append((name, kind, lineno))
+            self.recorded.add(name)
+
+    def assign_all(self, node):
+        """Apply a handwritten ``__all__ = [...]`` or ``__all__ += [...]``.
+        """
+        ast = self.ast
+        value = node.value
+        if (len(getattr(node, 'targets', [None])) != 1
+                or not isinstance(value, (ast.List, ast.Tuple))
+                or not all(isinstance(element, ast.Constant)
+                           and isinstance(element.value, str)
+                           for element in value.elts)):
+            self.error(node, 'cannot resolve assignment to __all__')
+        if not isinstance(node, ast.AugAssign):
+            self.records = None
+        elif self.records is None:
+            self.error(node, '__all__ extended before it was defined')
+        for element in value.elts:
+            kind, lineno = self.bound.get(element.value,
+                                          ('variable', node.lineno))
+            self.add_public(element.value, kind, lineno)
+
+    def call_policy(self, call) -> 'Optional[Callable]':
+        """Return the name policy passed to ``start_all``/``end_all``.
+
+        Only glob patterns and ``exclude_private`` can be resolved
+        statically.
+        """
+        ast = self.ast
+        if len(call.args) > 1:
+            self.error(call, 'cannot resolve positional name rules')
+        options = {}
+        for keyword in call.keywords:
+            if keyword.arg not in ('include', 'exclude', 'exclude_private'):
+                continue
+            try:
+                value = ast.literal_eval(keyword.value)
+            except ValueError:
+                value = None
+            if keyword.arg == 'exclude_private':
+                valid = isinstance(value, bool)
+            else:
+                valid = isinstance(value, str) or (
+                    isinstance(value, (list, tuple))
+                    and all(isinstance(rule, str) for rule in value))
+            if not valid:
+                self.error(call, 'cannot resolve {} rules'.format(
+                    keyword.arg))
+            options[keyword.arg] = value
+        return _name_policy(**options)
+
+    def visit_lazy(self, function: str, call):
+        """Apply a ``lazy_public()`` or ``public_from()`` call to the
+        simulated namespace."""
+        ast = self.ast
+        if function == 'lazy_public':
+            args, kind = call.args[:1], 'variable'
+        else:
+            args, kind = call.args[1:], 'import'
+        if not args:
+            self.error(call, 'cannot resolve {}() names'.format(function))
+        for arg in args:
+            if not (isinstance(arg, ast.Constant)
+                    and isinstance(arg.value, str)):
+                self.error(call, 'cannot resolve {}() names'.format(
+                    function))
+            self.bound.pop(arg.value, None)
+            self.conditional.pop(arg.value, None)
+            record = (arg.value, kind, call.lineno)
+            if self.lazy is None:
+                self.add_public(*record)
+            elif record[0] not in [lazy[0] for lazy in self.lazy]:
+                self.lazy.append(record)
+
+    def visit_auto_all(self, call):
+        """Apply an ``auto_all()`` call to the simulated namespace."""
+        ast = self.ast
+        if self.records is None:
+            self.records = []
+            self.recorded = set()
+        for name, (kind, lineno) in list(self.bound.items()):
+            if name[:1] == '_' or name in self.recorded:
+                continue
+            if name in self.opaque:
+                self.error(self.opaque[name], 'cannot resolve whether '
+                           'auto_all() exports {!r}'.format(name))
+            if kind in ('function', 'class'):
+                self.check_bound(name)
+                self.add_public(name, kind, lineno)
+        for arg in call.args:
+            if not (isinstance(arg, ast.Constant)
+                    and isinstance(arg.value, str)):
+                self.error(call, 'cannot resolve auto_all() arguments')
+            kind, lineno = self.bound.get(arg.value, ('variable', call.lineno))
+            self.add_public(arg.value, kind, lineno)
+
+    def visit_body(self, body):
+        for node in body:
+            self.visit(node)
+
+    def visit_branch(self, *bodies, target=None) -> 'Dict':
+        """Visit statements that may not run, and return the names they
+        bind. A loop ``target`` is bound before the statements."""
+        self.branches.append({})
+        if target is not None:
+            self.bind_target(target, target.lineno)
+        for body in bodies:
+            self.visit_body(body)
+        branch = self.branches.pop()
+        self.conditional.update(branch)
+        return branch
+
+    def merge_branches(self, branches: 'List'):
+        """Mark the names bound by every one of alternative branches, one
+        of which always runs, as bound."""
+        for name in set(branches[0]).intersection(*branches[1:]):
+            lineno = self.conditional.pop(name)
+            if self.branches:
+                self.branches[-1][name] = lineno
+
+    def visit(self, node):
+        ast = self.ast
+
+        if isinstance(node, ast.Expr):
+            function = self.auto_all_function(node.value)
+            if function in _DYNAMIC_FUNCTIONS:
+                self.error(node, 'cannot resolve {}()'.format(function))
+            if function is not None and self.branches:
+                self.error(node, 'cannot resolve conditional {}()'.format(
+                    function))
+            if function in ('start_all', 'end_all', 'freeze_all',
+                            'auto_all'):
+                self.calls.append(node)
+            if function == 'freeze_all':
+                return
+            if function == 'auto_all':
+                self.visit_auto_all(node.value)
+                return
+            if function in ('lazy_public', 'public_from'):
+                self.visit_lazy(function, node.value)
+                return
+            if function == 'start_all':
+                self.snapshot = set(self.bound)
+                self.policy = self.call_policy(node.value)
+                self.lazy = []
+                return
+            if function == 'end_all':
+                if self.snapshot is None:
+                    self.error(node, 'end_all() called before start_all()')
+                policy = self.call_policy(node.value) or self.policy
+                self.records = [
+                    (name, kind, lineno)
+                    for name, (kind, lineno) in self.bound.items()
+                    if name not in self.snapshot and name != '__all__'
+                    and (policy is None or policy(name, None))
+                ]
+                for name, _, _ in self.records:
+                    self.check_bound(name)
+                self.records.extend(self.lazy)
+                self.recorded = {record[0] for record in self.records}
+                self.lazy = None
+                self.bound['__all__'] = ('variable', node.lineno)
+                return
+            self.bind_walrus(node.value)
+
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef,
+                               ast.ClassDef)):
+            for decorator in node.decorator_list:
+                self.bind_walrus(decorator)
+            kind = 'class' if isinstance(node, ast.ClassDef) else 'function'
+            self.calls.extend(self.define(node.name, kind, node.lineno,
+                                          node.decorator_list))
+
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                local = alias.asname or alias.name.split('.')[0]
+                self.bind(local, 'import', node.lineno)
+                self.imported[local] = alias.name if alias.asname else local
+                if alias.name == 'auto_all':
+                    self.modules.add(local)
+                    self.imports.append(node)
+
+        elif isinstance(node, ast.ImportFrom):
+            for alias in node.names:
+                if alias.name == '*':
+                    self.unresolvable(node, 'cannot resolve wildcard import')
+                local = alias.asname or alias.name
+                self.bind(local, 'import', node.lineno)
+                if not node.level:
+                    self.imported[local] = '{}.{}'.format(node.module,
+                                                          alias.name)
+                if (node.module == 'auto_all' and not node.level
+                        and alias.name in _KNOWN_FUNCTIONS):
+                    self.aliases[local] = alias.name
+            if node.module == 'auto_all' and not node.level:
+                self.imports.append(node)
+
+        elif isinstance(node, (ast.Assign, ast.AugAssign, ast.AnnAssign)):
+            targets = getattr(node, 'targets', None) or [node.target]
+            if any(isinstance(target, ast.Name) and target.id == '__all__'
+                   for target in targets):
+                if self.branches:
+                    self.error(node, 'cannot resolve conditional assignment '
+                                     'to __all__')
+                self.assign_all(node)
+            elif node.value is not None:
+                self.bind_walrus(node.value)
+                opaque = self.opaque_value(node.value)
+                for target in targets:
+                    self.bind_target(target, node.lineno, opaque)
+
+        elif isinstance(node, ast.Delete):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    if target.id == '__all__':
+                        if self.branches:
+                            self.error(node, 'cannot resolve conditional '
+                                             'del __all__')
+                        self.records = None
+                    if self.branches:
+                        # The name may or may not still be bound.
+                        if target.id in self.bound:
+                            self.branches[-1].pop(target.id, None)
+                            self.conditional[target.id] = node.lineno
+                        continue
+                    self.conditional.pop(target.id, None)
+                    self.opaque.pop(target.id, None)
+                    self.imported.pop(target.id, None)
+                    self.bound.pop(target.id, None)
+                    # A deleted name that is defined again is added at the
+                    # end of the namespace, after the start_all() marker.
+                    if self.snapshot is not None:
+                        self.snapshot.discard(target.id)
+                    self.aliases.pop(target.id, None)
+                    self.modules.discard(target.id)
+
+        elif isinstance(node, (ast.For, ast.AsyncFor)):
+            self.bind_walrus(node.iter)
+            self.visit_branch(node.body, node.orelse, target=node.target)
+
+        elif isinstance(node, ast.While):
+            self.bind_walrus(node.test)
+            self.visit_branch(node.body, node.orelse)
+
+        elif isinstance(node, ast.If):
+            self.bind_walrus(node.test)
+            self.merge_branches([self.visit_branch(node.body),
+                                 self.visit_branch(node.orelse)])
+
+        elif isinstance(node, (ast.With, ast.AsyncWith)):
+            for item in node.items:
+                self.bind_walrus(item.context_expr)
+                if item.optional_vars is not None:
+                    self.bind_target(item.optional_vars, node.lineno)
+            # The context manager may suppress an exception in the body.
+            self.visit_branch(node.body)
+
+        elif isinstance(node, ast.Try) or type(node).__name__ == 'TryStar':
+            # Either the body and the else clause run, or one handler.
+            self.merge_branches(
+                [self.visit_branch(node.body, node.orelse)]
+                + [self.visit_branch(handler.body)
+                   for handler in node.handlers])
+            self.visit_body(node.finalbody)
+
+        elif type(node).__name__ == 'Match':
+            self.unresolvable(
+                node, 'cannot resolve names bound by match statement')
+
+        else:
+            self.bind_walrus(node)
+
+
+def _static_records(source: str, filename: str = '<unknown>'):
+    """Return ``(name, kind, lineno)`` records for a module's ``__all__``.
+
+    Returns ``None`` if the module would not get an ``__all__`` variable
+    from auto_all.
+    """
+    import ast
+    tree = ast.parse(source, filename)
+    analyser = _StaticAnalyser(filename)
+    analyser.visit_body(tree.body)
+    return analyser.result()
+
+
+_fast_patterns = None
+
+
+def _get_fast_patterns():
+    """Compile the regular expressions used by ``_fast_records`` once."""
+    global _fast_patterns
+    if _fast_patterns is None:
+        import re
+        name = r'[^\W\d]\w*'
+        _fast_patterns = (
+            # Anything that could affect the result of the analysis.
+            re.compile(r'auto_all|__all__'),
+            # Strings, comments, brackets and line continuations. String
+            # prefixes don't change where a string ends, so they are not
+            # matched.
+            re.compile(r'''
+                \'\'\'[^'\\]*(?:(?:\\.|'(?!''))[^'\\]*)*\'\'\'
+                |"""[^"\\]*(?:(?:\\.|"(?!""))[^"\\]*)*"""
+                |'[^'\\\n]*(?:\\.[^'\\\n]*)*'
+                |"[^"\\\n]*(?:\\.[^"\\\n]*)*"
+                |\#[^\n]*
+                |[(\[{)\]}]
+                |\\\r?\n
+            ''', re.VERBOSE | re.DOTALL),
+            # Lines starting a top level statement.
+            re.compile(r'^[^\s#]', re.MULTILINE),
+            # Function and class definitions.
+            re.compile(r'(?:async[ \t]+def|def|(class))[ \t]+({})'.format(
+                name)),
+            # Decorators that are plain dotted names.
+            re.compile(r'@[ \t]*({0}(?:[ \t]*\.[ \t]*{0})*)[ \t]*'
+                       r'(?:#[^\n]*)?\s*(?:#[^\n]*\s*)*\Z'.format(name)),
+        )
+    return _fast_patterns
+
+
+def _fast_records(source: str, filename: str = '<unknown>'):
+    """Return the same records as ``_static_records`` without parsing the
+    whole module.
+
+    The module is split into top level statements by finding the lines
+    that start at column zero outside strings and brackets. Function and
+    class definitions are handled from their first line, and their bodies,
+    usually most of a module, are never parsed. The remaining statements
+    are parsed with ``ast`` and applied by the same analyser as
+    ``_static_records``. Modules that never mention ``auto_all`` or
+    ``__all__`` are not parsed at all.
+
+    Unlike ``_static_records``, syntax errors in code that is skipped are
+    not reported. If the module can't be split reliably, or a statement
+    fails to parse, the whole module is analysed with ``_static_records``.
+    """
+    relevant, tokens, line_starts, definition, plain_decorator = (
+        _get_fast_patterns())
+
+    if not relevant.search(source):
+        return None
+    if '\f' in source:
+        return _static_records(source, filename)
+
+    # Spans in which a line start does not begin a new statement.
+    protected = []
+    depth = 0
+    for match in tokens.finditer(source):
+        text = match.group()
+        first = text[0]
+        if first in '([{':
+            if depth == 0:
+                opened = match.start()
+            depth += 1
+        elif first in ')]}':
+            depth -= 1
+            if depth == 0:
+                protected.append((opened, match.end()))
+            elif depth < 0:
+                return _static_records(source, filename)
+        elif first == '\\':
+            if depth == 0:
+                protected.append((match.start(), match.end() + 1))
+        elif first != '#':
+            if depth == 0 and '\n' in text:
+                protected.append((match.start(), match.end()))
+            # Python 3.12 allows the quote of an f-string to be used again
+            # in its replacement fields, which the pattern can't follow.
+            if ('{' in text
+                    and 'f' in source[max(match.start() - 2, 0):
+                                      match.start()].lower()
+                    and text.count('{') != text.count('}')):
+                return _static_records(source, filename)
+    if depth:
+        return _static_records(source, filename)
+
+    starts = []
+    spans = iter(protected)
+    span = next(spans, None)
+    for match in line_starts.finditer(source):
+        position = match.start()
+        while span is not None and span[1] <= position:
+            span = next(spans, None)
+        if span is None or position <= span[0]:
+            starts.append(position)
+    starts.append(len(source))
+
+    import ast
+    analyser = _StaticAnalyser(filename)
+    decorators = []
+    segment = None
+    lineno = 1
+    previous = 0
+
+    def parse(text, lineno, mode='exec'):
+        # Leading newlines give the nodes their line numbers in the module.
+        return ast.parse('\n' * (lineno - 1) + text, filename, mode)
+
+    try:
+        for start, end in zip(starts, starts[1:]):
+            lineno += source.count('\n', previous, start)
+            previous = start
+            is_definition = definition.match(source, start)
+            is_decorator = source[start] == '@'
+
+            if segment is not None and (is_definition or is_decorator):
+                analyser.visit_body(parse(source[segment[0]:start],
+                                          segment[1]).body)
+                segment = None
+
+            if is_decorator:
+                text = source[start:end]
+                match = plain_decorator.match(text)
+                if match:
+                    parts = match.group(1).split('.')
+                    decorators.append([part.strip() for part in parts])
+                else:
+                    decorators.append(parse(text[1:], lineno, 'eval').body)
+            elif is_definition:
+                kind = 'class' if is_definition.group(1) else 'function'
+                name = is_definition.group(2)
+                for decorator in decorators:
+                    if not isinstance(decorator, list):
+                        analyser.bind_walrus(decorator)
+                analyser.define(name, kind, lineno, decorators)
+                decorators = []
+            elif decorators:
+                # A decorator must be followed by a definition.
+                raise SyntaxError
+            elif segment is None:
+                segment = (start, lineno)
+
+        if decorators:
+            raise SyntaxError
+        if segment is not None:
+            analyser.visit_body(parse(source[segment[0]:], segment[1]).body)
+    except SyntaxError:
+        return _static_records(source, filename)
+
+    return analyser.result()
+
+
+def _get_engine(engine: str) -> 'Callable':
+    """Return the records function of a static analysis engine."""
+    if engine == 'ast':
+        return _static_records
+    if engine == 'fast':
+        return _fast_records
+    raise ValueError('Unknown engine: {!r}'.format(engine))
+
+
+def static_all(source: str, filename: str = '<unknown>',
+               engine: str = 'ast') -> 'Optional[List]':
+    """Compute a module's ``__all__`` from its source without running it.
+
+    The source is parsed and the names bound between the ``start_all()``
+    and ``end_all()`` calls, plus functions and classes decorated with
+    ``@public``, are resolved statically. Nothing is imported.
+
+        >>> static_all('''
+        ... from pathlib import Path
+        ... from auto_all import start_all, end_all, public
+        ...
+        ... def a_private_function():
+        ...     pass
+        ...
+        ... start_all()
+        ...
+        ... PUBLIC_VARIABLE = "I am public"
+        ...
+        ... class PublicClass:
+        ...     pass
+        ...
+        ... end_all()
+        ...
+        ... @public
+        ... def public_function():
+        ...     pass
+        ... ''')
+        ['PUBLIC_VARIABLE', 'PublicClass', 'public_function']
+
+    ``None`` is returned for modules that do not use auto_all:
+
+        >>> print(static_all('import os'))
+        None
+        >>> print(static_all('from os.path import *'))
+        None
+
+    Modules whose ``__all__`` depends on runtime behaviour raise
+    ``StaticAnalysisError``:
+
+        >>> static_all('''
+        ... from auto_all import start_all, end_all
+        ... start_all()
+        ... from os.path import *
+        ... end_all()
+        ... ''')
+        Traceback (most recent call last):
+          ...
+        auto_all.StaticAnalysisError: <unknown>:4: cannot resolve wildcard import
+
+    With ``engine='fast'`` only the top level statements outside function
+    and class definitions are parsed, which is several times faster on
+    typical modules. The results are the same, but syntax errors inside
+    function and class bodies are not detected.
+
+    Args:
+        source(str): Python source code of the module.
+        filename(str, optional): File name used in error messages.
+        engine(str, optional): ``'ast'`` to parse the whole module, or
+            ``'fast'``.
+
+    Returns:
+        list: The names that auto_all would put in ``__all__``, in
+        definition order, or ``None``.
+    """
+    records = _get_engine(engine)(source, filename)
+    if records is None:
+        return None
+    return [name for name, _, _ in records]
+
+
+def _removable(lines, node) -> bool:
+    """Check that ``node`` is the only code on the lines it spans."""
+    first = lines[node.lineno - 1]
+    last = lines[node.end_lineno - 1]
+    # Decorators start after the '@', statements at their first character.
+    start = node.col_offset
+    if first[:start].strip() not in ('', '@'):
+        return False
+    rest = last[node.end_col_offset:].strip()
+    return not rest or rest.startswith('#')
+
+
+def rewrite_source(source: str,
+                   filename: str = '<unknown>') -> 'Optional[str]':
+    """Rewrite a module to use a literal ``__all__`` instead of auto_all.
+
+    The ``start_all()``/``end_all()`` calls, ``@public`` decorators and the
+    imports of auto_all are removed, and a literal ``__all__`` tuple,
+    computed with ``static_all``, is appended to the module. The rewritten
+    module does not depend on auto_all at runtime. Line numbers are
+    preserved, so tracebacks still point at the right lines of the original
+    source.
+
+        >>> print(rewrite_source('''\\
+        ... from auto_all import start_all, end_all, public
+        ...
+        ... start_all()
+        ... PUBLIC_VARIABLE = "I am public"
+        ... end_all()
+        ...
+        ... @public
+        ... def public_function():
+        ...     pass
+        ... '''))
+        pass
+        <BLANKLINE>
+        pass
+        PUBLIC_VARIABLE = "I am public"
+        pass
+        <BLANKLINE>
+        <BLANKLINE>
+        def public_function():
+            pass
+        <BLANKLINE>
+        __all__ = ('PUBLIC_VARIABLE', 'public_function')
+        <BLANKLINE>
+
+    ``None`` is returned if the module does not use auto_all, or uses it in
+    a way that cannot be rewritten statically. Such modules should be left
+    as they are, and will compute ``__all__`` at runtime:
+
+        >>> print(rewrite_source('import os'))
+        None
+
+        >>> print(rewrite_source('''\\
+        ... from auto_all import public
+        ... export = public
+        ... '''))
+        None
+
+        >>> print(rewrite_source('''\\
+        ... from auto_all import start_all, end_all
+        ... start_all()
+        ... X = 1
+        ... end_all()
+        ... __all__ += ['Y']
+        ... '''))
+        None
+
+    Args:
+        source(str): Python source code of the module.
+        filename(str, optional): File name used in error messages.
+
+    Returns:
+        str: The rewritten source, or ``None``.
+    """
+    import ast
+    try:
+        tree = ast.parse(source, filename)
+        analyser = _StaticAnalyser(filename)
+        analyser.visit_body(tree.body)
+        analyser.result()
+    except (SyntaxError, StaticAnalysisError):
+        return None
+    if not analyser.imports:
+        return None
+
+    # Every reference to auto_all must be one that is being removed.
+    names = set(analyser.modules)
+    for node in analyser.imports:
+        for alias in node.names:
+            if isinstance(node, ast.ImportFrom):
+                if alias.name not in _AUTO_ALL_FUNCTIONS:
+                    return None
+                names.add(alias.asname or alias.name)
+            elif alias.name == 'auto_all':
+                names.add(alias.asname or alias.name)
+    references = 0
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            # The literal __all__ is only defined at the end of the module.
+            if node.id == '__all__':
+                return None
+            references += node.id in names
+    if references != len(analyser.calls):
+        return None
+
+    # end_all(set_dir=True) has a runtime effect beyond __all__.
+    if any(keyword.arg == 'set_dir'
+           for node in analyser.calls if isinstance(node, ast.Expr)
+           for keyword in node.value.keywords):
+        return None
+
+    lines = source.splitlines(True)
+    if lines and not lines[-1].endswith('\n'):
+        lines[-1] += '\n'
+    for node in analyser.calls + analyser.imports:
+        if not _removable(lines, node):
+            return None
+
+    for node in analyser.calls + analyser.imports:
+        first = lines[node.lineno - 1]
+        indent = first[:len(first) - len(first.lstrip())]
+        if isinstance(node, ast.Import):
+            others = [alias for alias in node.names
+                      if alias.name != 'auto_all']
+            replacement = 'import {}'.format(', '.join(
+                alias.name + (' as ' + alias.asname if alias.asname else '')
+                for alias in others)) if others else 'pass'
+        elif isinstance(node, ast.stmt):
+            replacement = 'pass'
+        else:
+            replacement = None
+        lines[node.lineno - 1] = (
+            indent + replacement + '\n' if replacement else '\n')
+        for lineno in range(node.lineno, node.end_lineno):
+            lines[lineno] = '\n'
+
+    names = tuple(name for name, _, _ in analyser.records or ())
+    lines.append('\n__all__ = {!r}\n'.format(names))
+    return ''.join(lines)
+
+
+def build_py_command(base: 'Optional[type]' = None) -> type:
+    """Create a ``build_py`` command that rewrites auto_all modules.
+
+    Modules copied into the build directory are rewritten with
+    ``rewrite_source``, so built wheels contain a literal ``__all__`` and
+    do not need auto_all installed at runtime. Source checkouts keep the
+    dynamic behaviour.
+
+    Use it in ``setup.py``::
+
+        from auto_all import build_py_command
+
+        setup(
+            ...
+            cmdclass={'build_py': build_py_command()},
+        )
+
+    and list ``auto-all`` in the ``build-system.requires`` of
+    ``pyproject.toml`` instead of the runtime requirements.
+
+    Args:
+        base(type, optional): The ``build_py`` command class to extend.
+            Defaults to the setuptools command.
+
+    Returns:
+        type: The command class.
+    """
+    if base is None:
+        from setuptools.command.build_py import build_py as base
+
+    class build_py(base):
+        def build_module(self, module, module_file, package):
+            result = super().build_module(module, module_file, package)
+            outfile, copied = result
+            if copied and not self.dry_run:
+                source = _read_source(outfile)
+                rewritten = rewrite_source(source, module_file)
+                if rewritten is not None:
+                    with open(outfile, 'w', encoding='utf-8') as f:
+                        f.write(rewritten)
+            return result
+
+    return build_py
+
+
+_HOOK_PYC_SUFFIX = '.auto-all.pyc'
+
+_import_hook_classes = None
+
+
+def _get_import_hook_classes():
+    """Create the import hook finder and loader classes on first use."""
+    global _import_hook_classes
+
+    if _import_hook_classes is not None:
+        return _import_hook_classes
+
+    from importlib.abc import MetaPathFinder
+    from importlib.machinery import PathFinder, SourceFileLoader
+    from importlib.util import decode_source
+
+    class AutoAllLoader(SourceFileLoader):
+        """Source loader that compiles auto_all modules with a literal
+        ``__all__``, caching the bytecode in separate ``__pycache__`` files.
+
+        Modules that don't mention auto_all use the standard ``.pyc``. This
+        is recorded when the module is compiled, with an empty file in
+        place of the separate bytecode, so cached imports never read the
+        source.
+        """
+
+        uses_auto_all = False
+
+        def source_to_code(self, data, path, *, _optimize=-1):
+            self.uses_auto_all = b'auto_all' in data
+            if self.uses_auto_all:
+                rewritten = rewrite_source(decode_source(data), path)
+                if rewritten is not None:
+                    data = rewritten
+            return super().source_to_code(data, path, _optimize=_optimize)
+
+        def get_data(self, path):
+            if not path.endswith('.pyc'):
+                return super().get_data(path)
+            hook_path = path[:-len('.pyc')] + _HOOK_PYC_SUFFIX
+            try:
+                data = super().get_data(hook_path)
+            except OSError:
+                # Bytecode compiled without the hook, for example by pip.
+                # Only trust it for modules without auto_all, and record
+                # the decision.
+                if b'auto_all' in super().get_data(self.path):
+                    raise
+                if not sys.dont_write_bytecode:
+                    super().set_data(hook_path, b'')
+                data = b''
+            return data or super().get_data(path)
+
+        def set_data(self, path, data, *, _mode=0o666):
+            if not path.endswith('.pyc'):
+                return super().set_data(path, data, _mode=_mode)
+            hook_path = path[:-len('.pyc')] + _HOOK_PYC_SUFFIX
+            if self.uses_auto_all:
+                return super().set_data(hook_path, data, _mode=_mode)
+            super().set_data(path, data, _mode=_mode)
+            super().set_data(hook_path, b'', _mode=_mode)
+
+    class AutoAllFinder(MetaPathFinder):
+        """Meta path finder that loads source modules with
+        ``AutoAllLoader``."""
+
+        def __init__(self, prefixes=None):
+            self.prefixes = tuple(prefixes) if prefixes else None
+
+        def find_spec(self, fullname, path, target=None):
+            if self.prefixes is not None and not any(
+                    fullname == prefix or fullname.startswith(prefix + '.')
+                    for prefix in self.prefixes):
+                return None
+            spec = PathFinder.find_spec(fullname, path, target)
+            if spec is None or type(spec.loader) is not SourceFileLoader:
+                return None
+            spec.loader = AutoAllLoader(fullname, spec.origin)
+            return spec
+
+    _import_hook_classes = AutoAllFinder, AutoAllLoader
+    return _import_hook_classes
+
+
+def install_import_hook(prefixes: 'Optional[Iterable[str]]' = None):
+    """Compute ``__all__`` statically when auto_all modules are imported.
+
+    A finder is added to the front of ``sys.meta_path``. Modules it loads
+    from source are rewritten with ``rewrite_source`` before they are
+    compiled, so they run with a literal ``__all__`` and no auto_all calls.
+    The compiled bytecode is cached in ``__pycache__`` next to the normal
+    ``.pyc`` files, using a ``.auto-all.pyc`` suffix, so later imports cost
+    the same as importing a module with a handwritten ``__all__``. Modules
+    that don't mention auto_all keep using the normal ``.pyc`` files, and an
+    empty ``.auto-all.pyc`` file records that, so their source isn't read
+    again on later imports.
+
+        >>> import os, tempfile
+        >>> tmp = tempfile.TemporaryDirectory()
+        >>> os.mkdir(os.path.join(tmp.name, 'hooked_pkg'))
+        >>> with open(os.path.join(tmp.name, 'hooked_pkg', '__init__.py'),
+        ...           'w') as f:
+        ...     _ = f.write('''\\
+        ... from auto_all import start_all, end_all
+        ... start_all()
+        ... PUBLIC_VARIABLE = "I am public"
+        ... end_all()
+        ... ''')
+
+        >>> dont_write_bytecode = sys.dont_write_bytecode
+        >>> sys.dont_write_bytecode = False
+        >>> sys.path.insert(0, tmp.name)
+        >>> finder = install_import_hook(['hooked_pkg'])
+        >>> import hooked_pkg
+        >>> hooked_pkg.__all__
+        ('PUBLIC_VARIABLE',)
+        >>> hasattr(hooked_pkg, 'start_all')
+        False
+        >>> cache = os.path.join(tmp.name, 'hooked_pkg', '__pycache__')
+        >>> os.listdir(cache)  # doctest: +ELLIPSIS
+        ['__init__....auto-all.pyc']
+
+        >>> uninstall_import_hook(finder)
+        >>> sys.dont_write_bytecode = dont_write_bytecode
+        >>> _ = sys.path.remove(tmp.name)
+        >>> del sys.modules['hooked_pkg']
+        >>> tmp.cleanup()
+
+    Modules that cannot be rewritten statically are loaded unchanged.
+
+    Args:
+        prefixes(iterable of str, optional): Only handle these packages and
+            modules, and their submodules. By default all modules loaded
+            from source files are handled.
+
+    Returns:
+        The installed finder, which can be passed to
+        ``uninstall_import_hook``.
+    """
+    finder_class, _ = _get_import_hook_classes()
+    finder = finder_class(prefixes)
+    sys.meta_path.insert(0, finder)
+    return finder
+
+
+def uninstall_import_hook(finder=None):
+    """Remove import hooks added by ``install_import_hook``.
+
+    Args:
+        finder(optional): The finder to remove. By default all auto_all
+            finders are removed.
+    """
+    if _import_hook_classes is None:
+        return
+    finder_class, _ = _import_hook_classes
+    sys.meta_path[:] = [
+        item for item in sys.meta_path
+        if not (item is finder
+                or (finder is None and isinstance(item, finder_class)))
+    ]
+
+
+def _find_source(paths: 'Iterable[str]',
+                 relative: str) -> 'Optional[str]':
+    """Find the source file of a submodule in a package's ``__path__``."""
+    import os
+    parts = relative.split('.')
+    for directory in paths:
+        base = os.path.join(directory, *parts)
+        for path in (base + '.py', os.path.join(base, '__init__.py')):
+            if os.path.isfile(path):
+                return path
+    return None
+
+
+def _find_submodules(paths: 'Iterable[str]') -> 'List':
+    """List the names of the modules and packages in a package directory.
+    """
+    import os
+    names = []
+    for directory in paths:
+        try:
+            entries = sorted(os.scandir(directory), key=lambda e: e.name)
+        except OSError:
+            continue
+        for entry in entries:
+            name, extension = os.path.splitext(entry.name)
+            if not name.isidentifier() or name == '__init__':
+                continue
+            if entry.is_file() and extension == '.py':
+                names.append(name)
+            elif entry.is_dir() and os.path.isfile(
+                    os.path.join(entry.path, '__init__.py')):
+                names.append(name)
+    return names
+
+
+def _static_all_cached(name: str, path: str) -> 'Optional[List]':
+    """Run ``static_all`` on a source file, using the disk cache if enabled.
+    """
+    cache = _cache_entry(name + '@static', path)
+    if cache is not None:
+        names = _cache_read(*cache)
+        if names is not None:
+            # The first line distinguishes an empty __all__ from no __all__
+            return names[1:] if names and names[0] == '__all__' else None
+
+    names = static_all(_read_source(path), path, engine='fast')
+
+    if cache is not None:
+        _cache_write(*cache, [] if names is None else ['__all__'] + names)
+    return names
+
+
+def facade(*submodules: str, globs: 'Optional[Dict]' = None):
+    """Re-export the public names of submodules without importing them.
+
+    Call ``facade()`` in a package's ``__init__.py`` instead of importing
+    every submodule just to re-export its ``__all__``. The public names of
+    each submodule are found with ``static_all`` and added to the package's
+    ``__all__``. This reads and parses the source of every submodule each
+    time the package is imported, unless the disk cache is enabled. A
+    module level ``__getattr__`` imports the owning submodule on first
+    access to one of the names, and ``__dir__`` lists the public names
+    before they are loaded.
+
+        >>> import os, tempfile
+        >>> tmp = tempfile.TemporaryDirectory()
+        >>> os.mkdir(os.path.join(tmp.name, 'facade_pkg'))
+        >>> sources = {
+        ...     '__init__.py': 'import auto_all\\nauto_all.facade()\\n',
+        ...     'heavy.py': 'from auto_all import public\\n'
+        ...                 '@public\\n'
+        ...                 'def thing():\\n'
+        ...                 '    return "thing"\\n',
+        ... }
+        >>> for filename, source in sources.items():
+        ...     with open(os.path.join(tmp.name, 'facade_pkg', filename),
+        ...               'w') as f:
+        ...         _ = f.write(source)
+
+        >>> sys.path.insert(0, tmp.name)
+        >>> import facade_pkg
+        >>> facade_pkg.__all__
+        ['thing']
+        >>> 'facade_pkg.heavy' in sys.modules
+        False
+        >>> 'thing' in dir(facade_pkg)
+        True
+        >>> facade_pkg.thing()
+        'thing'
+        >>> 'facade_pkg.heavy' in sys.modules
+        True
+
+        >>> _ = sys.path.remove(tmp.name)
+        >>> del sys.modules['facade_pkg'], sys.modules['facade_pkg.heavy']
+        >>> tmp.cleanup()
+
+    If two submodules export the same name, the first one listed wins.
+    Submodules found in the package directory are skipped if they don't use
+    auto_all or ``__all__``, or if their source can't be read or analysed.
+
+    Args:
+        *submodules(str): Names of the submodules to re-export, relative to
+            the package, for example ``'heavy'`` or ``'.heavy'``. By default
+            every module and subpackage in the package directory that
+            defines ``__all__`` is used.
+        globs(dict, optional): Pass the globals dictionary of the package
+            using ``globals()``.
+
+    Raises:
+        ValueError: A listed submodule was not found, or has no ``__all__``.
+        StaticAnalysisError: The ``__all__`` of a listed submodule can't be
+            determined without running it.
+        SyntaxError: A listed submodule can't be parsed.
+    """
+    if not globs:
+        globs = _get_globals()
+
+    package = globs['__name__']
+    paths = globs['__path__']
+    explicit = bool(submodules)
+    if not explicit:
+        submodules = _find_submodules(paths)
+
+    owners = {}
+    for submodule in submodules:
+        relative = submodule.lstrip('.')
+        path = _find_source(paths, relative)
+        if path is None:
+            raise ValueError('submodule {!r} of package {!r} not found'.format(
+                submodule, package))
+        try:
+            names = _static_all_cached(package + '.' + relative, path)
+        except (OSError, SyntaxError, ValueError):
+            if explicit:
+                raise
+            continue
+        if names is None:
+            if explicit:
+                raise ValueError('submodule {!r} of package {!r} does not '
+                                 'define __all__'.format(submodule, package))
+            continue
+        for name in names:
+            owners.setdefault(name, package + '.' + relative)
+
+    attributes = _lazy_attributes(globs)
+    all_var = _module_all(globs)
+    for name, module in owners.items():
+        if name not in globs:
+            attributes[name] = _import_factory(module, name)
+        all_var.append(name)
+
+    _install_dir(globs)
+
+
+def _read_source(path: str) -> str:
+    import tokenize
+    with tokenize.open(path) as f:
+        return f.read()
+
+
+def _module_files(root: str):
+    """Yield ``(path, module)`` for the Python source files under ``root``.
+
+    Module names are relative to ``root``, or to its parent if ``root`` is
+    itself a package. Hidden directories and ``__pycache__`` are skipped.
+    Directories are listed one at a time, in sorted order.
+    """
+    import os
+
+    if os.path.isfile(root):
+        name = os.path.splitext(os.path.basename(root))[0]
+        yield root, name
+        return
+
+    base = root
+    if os.path.isfile(os.path.join(root, '__init__.py')):
+        base = os.path.dirname(os.path.abspath(root))
+        root = os.path.abspath(root)
+
+    for directory, dirs, files in os.walk(root):
+        dirs[:] = sorted(d for d in dirs
+                         if not d.startswith('.') and d != '__pycache__')
+        prefix = os.path.relpath(directory, base)
+        prefix = '' if prefix == '.' else prefix.replace(os.sep, '.') + '.'
+        for filename in sorted(files):
+            name, ext = os.path.splitext(filename)
+            if ext != '.py':
+                continue
+            if name == '__init__':
+                module = prefix[:-1] or name
+            else:
+                module = prefix + name
+            yield os.path.join(directory, filename), module
+
+
+def _scan_batch(batch: 'List[Tuple[str, str]]', errors: str,
+                engine: str) -> 'Tuple[List, List]':
+    """Return the records for a batch of ``(path, module)`` pairs, and the
+    ``(path, message)`` pairs of the files that were skipped.
+
+    Runs in the worker processes of ``scan_tree``.
+    """
+    records_function = _get_engine(engine)
+    results = []
+    skipped = []
+    for path, module in batch:
+        try:
+            records = records_function(_read_source(path), path)
+        except (OSError, SyntaxError, ValueError) as e:
+            if errors == 'raise':
+                raise
+            skipped.append((path, str(e)))
+            continue
+        if records:
+            results.extend((module, name, kind, lineno)
+                           for name, kind, lineno in records)
+    return results, skipped
+
+
+def _scan_results(results: 'Tuple[List, List]'):
+    """Generate the records of a ``_scan_batch`` result, warning about the
+    skipped files."""
+    records, skipped = results
+    if skipped:
+        import warnings
+        for path, message in skipped:
+            warnings.warn('skipped {}: {}'.format(path, message),
+                          RuntimeWarning, stacklevel=3)
+    yield from records
+
+
+def scan_tree(root: str, workers: 'Optional[int]' = None,
+              errors: str = 'skip', batch_size: int = 64,
+              engine: str = 'fast'):
+    """Statically compute the public names of every module under a path.
+
+    Source files are analysed in a pool of processes, with the same
+    analysis as ``static_all``, so nothing is imported. Records are
+    generated as ``(module, name, kind, lineno)`` tuples, where ``kind`` is
+    ``'function'``, ``'class'``, ``'variable'`` or ``'import'``. Files are
+    handed to the workers in batches, and only a few batches per worker are
+    in flight at once, so memory use does not grow with the size of the
+    tree. Records are generated in the order the files are found.
+
+        >>> import os, tempfile
+        >>> tmp = tempfile.TemporaryDirectory()
+        >>> os.mkdir(os.path.join(tmp.name, 'package'))
+        >>> with open(os.path.join(tmp.name, 'package', '__init__.py'),
+        ...           'w') as f:
+        ...     _ = f.write('')
+        >>> with open(os.path.join(tmp.name, 'package', 'module.py'),
+        ...           'w') as f:
+        ...     _ = f.write('''
+        ... from auto_all import start_all, end_all, public
+        ... start_all()
+        ... PUBLIC_VARIABLE = 1
+        ... class PublicClass:
+        ...     pass
+        ... end_all()
+        ... @public
+        ... def public_function():
+        ...     pass
+        ... ''')
+
+        >>> for record in scan_tree(tmp.name, workers=2):
+        ...     print(record)
+        ('package.module', 'PUBLIC_VARIABLE', 'variable', 4)
+        ('package.module', 'PublicClass', 'class', 5)
+        ('package.module', 'public_function', 'function', 9)
+        >>> tmp.cleanup()
+
+    Args:
+        root(str): Directory to scan, or a single source file. If it is a
+            package, module names include the package name.
+        workers(int, optional): Number of worker processes. Defaults to the
+            number of CPUs. With ``0`` or ``1`` files are analysed in the
+            calling process.
+        errors(str, optional): ``'skip'`` to skip files that can't be read
+            or analysed, with a ``RuntimeWarning`` for each one, or
+            ``'raise'`` to raise the first such error.
+        batch_size(int, optional): Number of files per task sent to a
+            worker.
+        engine(str, optional): Static analysis engine, ``'fast'`` or
+            ``'ast'``. See ``static_all``.
+    """
+    if errors not in ('raise', 'skip'):
+        raise ValueError('Unknown errors value: {!r}'.format(errors))
+    _get_engine(engine)
+
+    import itertools
+    import os
+    files = _module_files(root)
+    batches = iter(lambda: list(itertools.islice(files, batch_size)), [])
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        for batch in batches:
+            yield from _scan_results(_scan_batch(batch, errors, engine))
+        return
+
+    import collections
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(workers) as executor:
+        pending = collections.deque()
+        try:
+            for batch in batches:
+                pending.append(executor.submit(_scan_batch, batch, errors,
+                                               engine))
+                if len(pending) >= workers * 4:
+                    yield from _scan_results(pending.popleft().result())
+            while pending:
+                yield from _scan_results(pending.popleft().result())
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def _main(argv: 'Optional[List]' = None) -> int:
+    """Command line entry point for ``python -m auto_all``."""
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(
+        prog='python -m auto_all',
+        description='Statically compute the __all__ variable of modules '
+                    'that use auto_all, without importing them.')
+    parser.add_argument('paths', nargs='+', metavar='PATH',
+                        help='Python source files to analyse, or '
+                             'directories with --records.')
+    parser.add_argument('--json', action='store_true',
+                        help='Output a JSON object mapping each path to its '
+                             '__all__ list.')
+    parser.add_argument('--records', action='store_true',
+                        help='Scan every module under each PATH in parallel '
+                             'and stream [module, name, kind, lineno] '
+                             'records as JSON lines.')
+    parser.add_argument('-j', '--jobs', type=int, metavar='N',
+                        help='Number of worker processes for --records '
+                             '(default: number of CPUs).')
+    parser.add_argument('--strict', action='store_true',
+                        help='With --records, stop at the first file that '
+                             'cannot be read or analysed, instead of '
+                             'skipping it with a warning.')
+    parser.add_argument('--engine', choices=('ast', 'fast'),
+                        help='Static analysis engine. Defaults to ast, or '
+                             'fast with --records.')
+    parser.add_argument('-o', '--output', metavar='FILE',
+                        help='Write the output to FILE instead of stdout.')
+    args = parser.parse_args(argv)
+
+    if args.records:
+        return _main_records(parser, args)
+
+    results = {}
+    for path in args.paths:
+        try:
+            results[path] = static_all(_read_source(path), path,
+                                       args.engine or 'ast')
+        except (OSError, SyntaxError, StaticAnalysisError) as e:
+            parser.exit(1, 'error: {}\n'.format(e))
+
+    if args.json:
+        output = json.dumps(results, indent=2) + '\n'
+    else:
+        lines = []
+        for path, names in results.items():
+            if len(results) > 1:
+                lines.append('# {}'.format(path))
+            if names is not None:
+                lines.append('__all__ = {!r}'.format(names))
+        output = ''.join(line + '\n' for line in lines)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        sys.stdout.write(output)
+
+    return 0
+
+
+def _main_records(parser, args) -> int:
+    """Stream the records of ``scan_tree`` as JSON lines."""
+    import json
+    import warnings
+
+    def show_warning(message, *args, **kwargs):
+        sys.stderr.write('warning: {}\n'.format(message))
+
+    errors = 'raise' if args.strict else 'skip'
+    output = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('always', RuntimeWarning)
+            warnings.showwarning = show_warning
+            for path in args.paths:
+                for record in scan_tree(path, args.jobs, errors,
+                                        engine=args.engine or 'fast'):
+                    output.write(json.dumps(record) + '\n')
+    except (OSError, SyntaxError, ValueError) as e:
+        parser.exit(1, 'error: {}\n'.format(e))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    return 0
+
+
+__all__ = ['start_all', 'end_all', 'public', 'public_many', 'freeze_all',
+           'auto_all', 'PublicNames', 'static_all', 'StaticAnalysisError',
+           'rewrite_source', 'build_py_command', 'install_import_hook',
+           'uninstall_import_hook', 'enable_cache', 'disable_cache', 'facade',
+           'install_dir', 'lazy_public', 'public_from', 'enable_profiling',
+           'disable_profiling', 'profile_stats', 'profile_report', 'scan_tree']
+
+if __name__ == '__main__':
+    sys.exit(_main())
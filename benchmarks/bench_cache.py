@@ -0,0 +1,84 @@
+"""Benchmark importing a large facade package with the on-disk cache.
+
+Run from the repository root::
+
+    python benchmarks/bench_cache.py
+
+A synthetic package of 1,000 modules using ``start_all``/``end_all`` is
+generated, with an ``__init__.py`` that re-exports them with ``facade()``.
+The package is imported in fresh interpreters without the cache, with an
+empty (cold) cache and with a populated (warm) cache.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+MODULES = 1000
+NAMES = 50
+REPEAT = 5
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_PACKAGE = '''
+import time
+start = time.perf_counter()
+import synthetic_pkg
+print(time.perf_counter() - start)
+'''
+
+
+def _write_package(directory):
+    package = os.path.join(directory, 'synthetic_pkg')
+    os.mkdir(package)
+    with open(os.path.join(package, '__init__.py'), 'w') as f:
+        f.write('import auto_all\nauto_all.facade()\n')
+    body = ''.join('NAME_{}_{{0}} = {}\n'.format(i, i) for i in range(NAMES))
+    for i in range(MODULES):
+        with open(os.path.join(package, 'mod{}.py'.format(i)), 'w') as f:
+            f.write('from auto_all import start_all, end_all\n'
+                    'import os, sys\n'
+                    'start_all()\n' + body.format(i) + 'end_all()\n')
+
+
+def _import_time(directory, cache_dir=None):
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    env.pop('AUTO_ALL_CACHE_DIR', None)
+    env['PYTHONPATH'] = os.pathsep.join([ROOT, directory])
+    if cache_dir is not None:
+        env['AUTO_ALL_CACHE_DIR'] = cache_dir
+    output = subprocess.check_output([sys.executable, '-c', IMPORT_PACKAGE],
+                                     env=env, universal_newlines=True)
+    return float(output)
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    try:
+        _write_package(directory)
+        cache_dir = os.path.join(directory, 'cache')
+        _import_time(directory)  # Write the bytecode cache
+
+        no_cache = min(_import_time(directory) for _ in range(REPEAT))
+
+        cold = []
+        for _ in range(REPEAT):
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            cold.append(_import_time(directory, cache_dir))
+
+        warm = min(_import_time(directory, cache_dir)
+                   for _ in range(REPEAT))
+    finally:
+        shutil.rmtree(directory)
+
+    print('{} modules, {} public names each'.format(MODULES, NAMES))
+    print('{:>12} {:>10}'.format('mode', 'ms'))
+    for mode, seconds in (('no cache', no_cache), ('cold cache', min(cold)),
+                          ('warm cache', warm)):
+        print('{:>12} {:>10.1f}'.format(mode, seconds * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Benchmark the per-call cost of auto_all frame resolution by stack depth.
+
+Run from the repository root::
+
+    python benchmarks/bench_frames.py
+
+Each ``start_all()``/``end_all()``/``@public`` call is timed with the
+calling code nested at increasing stack depths. The cost per call should
+stay flat as the depth grows.
+"""
+import sys
+import timeit
+
+sys.path.insert(0, '.')
+
+from auto_all import end_all, public, start_all  # noqa: E402
+
+DEPTHS = (1, 50, 200, 500)
+NUMBER = 2000
+
+
+def _workload():
+    globs = {'__name__': 'bench'}
+    start_all(globs)
+    globs['value'] = 1
+    end_all(globs)
+
+    def func():
+        pass
+
+    start_all()
+    end_all()
+    public(func)
+
+
+def _noop():
+    pass
+
+
+def _at_depth(depth, func):
+    if depth <= 1:
+        return func()
+    return _at_depth(depth - 1, func)
+
+
+def _best(func):
+    return min(timeit.Timer(func).repeat(repeat=5, number=NUMBER))
+
+
+def main():
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), max(DEPTHS) + 100))
+    print('{:>8} {:>14}'.format('depth', 'usec per call'))
+    for depth in DEPTHS:
+        best = _best(lambda: _at_depth(depth, _workload))
+        # Subtract the cost of recursing to ``depth`` on its own.
+        baseline = _best(lambda: _at_depth(depth, _noop))
+        print('{:>8} {:>14.2f}'.format(depth,
+                                       (best - baseline) / NUMBER * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Benchmark star-imports and membership checks on frozen ``__all__``.
+
+Run from the repository root::
+
+    python benchmarks/bench_freeze.py
+
+A module with 1,000 public names is star-imported, and every name is
+checked for membership in ``__all__``, with ``__all__`` stored as a plain
+list of non-interned strings (as auto_all used to produce), a
+``PublicNames`` list and a frozen tuple of interned names.
+"""
+import sys
+import timeit
+import types
+
+sys.path.insert(0, '.')
+
+from auto_all import PublicNames  # noqa: E402
+
+NAMES = 1000
+NUMBER = 200
+
+# Build names at runtime so they are not interned by the compiler.
+NAMES_LIST = [''.join(['public_', str(i)]) for i in range(NAMES)]
+STAR_IMPORT = compile('from bench_star import *', '<bench>', 'exec')
+LOOKUPS = [''.join(['public_', str(i)]) for i in range(0, NAMES, 7)]
+
+
+def _module(all_var):
+    module = types.ModuleType('bench_star')
+    for name in NAMES_LIST:
+        setattr(module, name, None)
+    module.__all__ = all_var
+    return module
+
+
+def main():
+    variants = (
+        ('list', list(NAMES_LIST)),
+        ('PublicNames', PublicNames(NAMES_LIST)),
+        ('frozen', PublicNames(NAMES_LIST).freeze()),
+    )
+    print('{} public names'.format(NAMES))
+    print('{:>12} {:>18} {:>18}'.format('__all__', 'star import (us)',
+                                        'membership (us)'))
+    for label, all_var in variants:
+        sys.modules['bench_star'] = _module(all_var)
+        star = min(timeit.repeat(lambda: exec(STAR_IMPORT, {}),
+                                 number=NUMBER, repeat=5))
+
+        def membership():
+            for name in LOOKUPS:
+                name in all_var
+
+        member = min(timeit.repeat(membership, number=NUMBER, repeat=5))
+        print('{:>12} {:>18.2f} {:>18.2f}'.format(
+            label, star / NUMBER * 1e6, member / NUMBER * 1e6))
+    del sys.modules['bench_star']
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+"""Import-time benchmark suite for auto_all.
+
+Run from the repository root::
+
+    python benchmarks/bench_import.py [--quick] [-o results.json]
+    python benchmarks/bench_import.py --compare baseline.json
+
+Synthetic packages are generated with a varying number of modules, size of
+the module namespace outside the public block, and stack depth at which
+the package is imported. Each package is imported in fresh interpreters
+with every way auto_all offers of defining ``__all__``:
+
+* ``handwritten``: a literal ``__all__`` list, as a baseline.
+* ``start_end``: ``start_all()``/``end_all()``.
+* ``public``: the ``@public`` decorator.
+* ``auto_all``: a single ``auto_all()`` call.
+* ``import_hook``: ``start_all()``/``end_all()`` with the import hook.
+* ``rewritten``: modules rewritten at build time with ``rewrite_source``.
+
+Import time and peak traced memory are measured in separate runs, so that
+tracemalloc does not distort the timings. Results are written as JSON in
+a layout modelled on pyperf's, with every run value kept.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, ROOT)
+
+from auto_all import rewrite_source  # noqa: E402
+
+MODES = ('handwritten', 'start_end', 'public', 'auto_all', 'import_hook',
+         'rewritten')
+
+PUBLIC_NAMES = 20
+
+FULL_GRID = {
+    'modules': (100, 1000),
+    'namespace': (10, 1000),
+    'depth': (1, 200),
+}
+
+QUICK_GRID = {
+    'modules': (100,),
+    'namespace': (10,),
+    'depth': (1,),
+}
+
+RUNNER = '''
+import sys
+sys.setrecursionlimit(10000)
+{setup}
+import time
+import tracemalloc
+
+def load():
+    for i in range({modules}):
+        __import__('synthetic_pkg.mod{{}}'.format(i))
+
+def nested(depth):
+    if depth <= 1:
+        return load()
+    return nested(depth - 1)
+
+if {memory}:
+    tracemalloc.start()
+    nested({depth})
+    print(tracemalloc.get_traced_memory()[1])
+else:
+    start = time.perf_counter()
+    nested({depth})
+    print(time.perf_counter() - start)
+'''
+
+HOOK_SETUP = '''
+import auto_all
+auto_all.install_import_hook(['synthetic_pkg'])
+'''
+
+
+def _module_source(mode, namespace):
+    private = ''.join('_private_{} = {}\n'.format(i, i)
+                      for i in range(namespace))
+    names = ['public_{}'.format(i) for i in range(PUBLIC_NAMES)]
+    functions = ''.join('def {}():\n    pass\n'.format(name)
+                        for name in names)
+
+    if mode == 'handwritten':
+        return private + functions + '__all__ = {!r}\n'.format(names)
+    if mode == 'public':
+        return ('from auto_all import public\n' + private
+                + functions.replace('def ', '@public\ndef '))
+    if mode == 'auto_all':
+        return 'from auto_all import auto_all\n' + private + functions + (
+            'auto_all()\n')
+
+    source = ('from auto_all import start_all, end_all\n' + private
+              + 'start_all()\n' + functions + 'end_all()\n')
+    if mode == 'rewritten':
+        return rewrite_source(source)
+    return source
+
+
+def _write_package(directory, mode, modules, namespace):
+    package = os.path.join(directory, 'synthetic_pkg')
+    os.mkdir(package)
+    open(os.path.join(package, '__init__.py'), 'w').close()
+    source = _module_source(mode, namespace)
+    for i in range(modules):
+        with open(os.path.join(package, 'mod{}.py'.format(i)), 'w') as f:
+            f.write(source)
+
+
+def _run(directory, mode, modules, depth, memory=False):
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    env['PYTHONPATH'] = os.pathsep.join([ROOT, directory])
+    code = RUNNER.format(
+        setup=HOOK_SETUP if mode == 'import_hook' else '',
+        modules=modules, depth=depth, memory=memory)
+    output = subprocess.check_output([sys.executable, '-c', code],
+                                     env=env, universal_newlines=True)
+    return float(output)
+
+
+def run_benchmark(mode, modules, namespace, depth, runs):
+    """Run one benchmark and return it as a pyperf-style dict."""
+    directory = tempfile.mkdtemp()
+    try:
+        _write_package(directory, mode, modules, namespace)
+        # Warm up: write bytecode.
+        _run(directory, mode, modules, depth)
+        times = [_run(directory, mode, modules, depth) for _ in range(runs)]
+        peak = _run(directory, mode, modules, depth, memory=True)
+    finally:
+        shutil.rmtree(directory)
+
+    name = '{}[modules={},namespace={},depth={}]'.format(
+        mode, modules, namespace, depth)
+    return {
+        'metadata': {
+            'name': name,
+            'mode': mode,
+            'modules': modules,
+            'namespace': namespace,
+            'depth': depth,
+            'unit': 'second',
+            'peak_memory': int(peak),
+        },
+        'runs': [{'values': times}],
+    }
+
+
+def _summary(benchmark):
+    values = benchmark['runs'][0]['values']
+    return statistics.median(values), benchmark['metadata']['peak_memory']
+
+
+def _print_results(benchmarks, baseline=None):
+    baseline = {b['metadata']['name']: b for b in baseline or []}
+    print('{:<50} {:>10} {:>10} {:>10}'.format(
+        'benchmark', 'ms', 'peak KiB', 'vs base'))
+    for benchmark in benchmarks:
+        name = benchmark['metadata']['name']
+        median, peak = _summary(benchmark)
+        change = ''
+        if name in baseline:
+            base_median, _ = _summary(baseline[name])
+            change = '{:+.1f}%'.format((median / base_median - 1) * 100)
+        print('{:<50} {:>10.2f} {:>10.1f} {:>10}'.format(
+            name, median * 1000, peak / 1024, change))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--quick', action='store_true',
+                        help='Run a single small configuration.')
+    parser.add_argument('--runs', type=int, default=5,
+                        help='Timed runs per benchmark (default: 5).')
+    parser.add_argument('--mode', action='append', choices=MODES,
+                        help='Only run these modes (repeatable).')
+    parser.add_argument('-o', '--output', metavar='FILE',
+                        help='Write the results as JSON to FILE.')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='Compare median times against a previous JSON '
+                             'results file.')
+    args = parser.parse_args(argv)
+
+    grid = QUICK_GRID if args.quick else FULL_GRID
+    benchmarks = []
+    for mode in args.mode or MODES:
+        for modules, namespace, depth in itertools.product(
+                grid['modules'], grid['namespace'], grid['depth']):
+            benchmarks.append(
+                run_benchmark(mode, modules, namespace, depth, args.runs))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['benchmarks']
+    _print_results(benchmarks, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'version': '1.0',
+                'metadata': {
+                    'python_version': platform.python_version(),
+                    'python_implementation':
+                        platform.python_implementation(),
+                    'platform': platform.platform(),
+                    'public_names': PUBLIC_NAMES,
+                },
+                'benchmarks': benchmarks,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
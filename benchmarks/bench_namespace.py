@@ -0,0 +1,41 @@
+"""Benchmark start_all/end_all against the size of the existing namespace.
+
+Run from the repository root::
+
+    python benchmarks/bench_namespace.py
+
+Each block defines the same small number of names in a namespace that
+already contains an increasing number of globals. The cost per block
+should stay flat as the namespace grows.
+"""
+import sys
+import timeit
+
+sys.path.insert(0, '.')
+
+from auto_all import end_all, start_all  # noqa: E402
+
+SIZES = (10, 1000, 10000, 100000)
+NEW_NAMES = ['name_{}'.format(i) for i in range(10)]
+NUMBER = 2000
+
+
+def main():
+    print('{:>10} {:>14}'.format('globals', 'usec per block'))
+    for size in SIZES:
+        globs = {'existing_{}'.format(i): i for i in range(size)}
+
+        def block():
+            start_all(globs)
+            for name in NEW_NAMES:
+                globs[name] = None
+            end_all(globs)
+            for name in NEW_NAMES:
+                del globs[name]
+
+        best = min(timeit.Timer(block).repeat(repeat=5, number=NUMBER))
+        print('{:>10} {:>14.2f}'.format(size, best / NUMBER * 1e6))
+
+
+if __name__ == '__main__':
+    main()
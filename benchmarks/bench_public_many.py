@@ -0,0 +1,59 @@
+"""Benchmark exporting generated functions with public_many and @public.
+
+Run from the repository root::
+
+    python benchmarks/bench_public_many.py
+
+10,000 generated functions are exported from a fresh module namespace,
+once by calling ``public()`` on each function and once with a single
+``public_many()`` call.
+"""
+import sys
+import timeit
+
+sys.path.insert(0, '.')
+
+from auto_all import public, public_many  # noqa: E402
+
+ITEMS = 10000
+REPEAT = 5
+
+MODULE_CODE = '''
+def make(i):
+    def func():
+        return i
+    func.__name__ = 'func_{}'.format(i)
+    return func
+
+functions = [make(i) for i in range(ITEMS)]
+'''
+
+PER_ITEM = MODULE_CODE + '''
+for func in functions:
+    globals()[func.__name__] = public(func)
+'''
+
+BATCH = MODULE_CODE + '''
+public_many(functions)
+'''
+
+
+def _run(code):
+    globs = {'__name__': 'generated', 'ITEMS': ITEMS, 'public': public,
+             'public_many': public_many}
+    exec(code, globs)
+
+
+def main():
+    baseline = min(timeit.repeat(lambda: _run(MODULE_CODE), number=1,
+                                 repeat=REPEAT))
+    print('{} generated functions'.format(ITEMS))
+    print('{:>12} {:>10}'.format('mode', 'ms'))
+    for mode, code in (('@public', PER_ITEM), ('public_many', BATCH)):
+        best = min(timeit.repeat(lambda: _run(code), number=1,
+                                 repeat=REPEAT))
+        print('{:>12} {:>10.2f}'.format(mode, (best - baseline) * 1000))
+
+
+if __name__ == '__main__':
+    main()
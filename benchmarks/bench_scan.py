@@ -0,0 +1,114 @@
+"""Benchmark the ``ast`` and ``fast`` static analysis engines.
+
+Run from the repository root::
+
+    python benchmarks/bench_scan.py [DIRECTORY]
+
+Every Python file under DIRECTORY (the standard library by default) is
+analysed with both engines, followed by a generated set of modules that
+all use auto_all, so that no file is skipped by the ``fast`` engine's
+pre-filter. The time taken by each engine is printed, along with the
+number of files on which the engines disagree, which should be zero.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, '.')
+
+from auto_all import StaticAnalysisError, _read_source, static_all  # noqa
+
+GENERATED = 1000
+
+GENERATED_MODULE = '''
+"""A generated module."""
+import os
+from auto_all import start_all, end_all, public
+
+_CACHE = {{}}
+
+start_all()
+
+VERSION = '{i}'
+
+class Record:
+    """A record."""
+
+    def __init__(self, name, values):
+        self.name = name
+        self.values = [value * 2 for value in values if value]
+
+    def total(self):
+        return sum(self.values) + len(self.name)
+
+end_all()
+
+
+@public
+def load(path):
+    with open(os.path.join(path, 'data')) as f:
+        return [Record(line.strip(), range(10)) for line in f]
+
+
+def _helper(items):
+    for item in items:
+        if item.total() > 10:
+            yield {{'name': item.name, 'total': item.total()}}
+'''
+
+
+def _sources(directory):
+    sources = []
+    for root, dirs, files in os.walk(directory):
+        for name in files:
+            if name.endswith('.py'):
+                path = os.path.join(root, name)
+                try:
+                    sources.append((path, _read_source(path)))
+                except (OSError, SyntaxError, ValueError):
+                    pass
+    return sources
+
+
+def _outcome(engine, source, path):
+    try:
+        return static_all(source, path, engine)
+    except StaticAnalysisError as e:
+        return str(e)
+    except SyntaxError:
+        return SyntaxError
+
+
+def _run(label, sources):
+    outcomes = {}
+    times = {}
+    for engine in ('ast', 'fast'):
+        start = time.perf_counter()
+        outcomes[engine] = [_outcome(engine, source, path)
+                            for path, source in sources]
+        times[engine] = time.perf_counter() - start
+
+    disagree = sum(
+        1 for expected, actual in zip(outcomes['ast'], outcomes['fast'])
+        if expected is not SyntaxError and expected != actual)
+    size = sum(len(source) for _, source in sources) / 1e6
+    print('{} ({} files, {:.1f} MB)'.format(label, len(sources), size))
+    for engine in ('ast', 'fast'):
+        print('{:>8} {:>10.2f} s {:>10.1f} MB/s'.format(
+            engine, times[engine], size / times[engine]))
+    print('{:>8} {:>10.1f}x'.format('speedup', times['ast'] / times['fast']))
+    print('{:>8} {:>10}'.format('disagree', disagree))
+
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else os.path.dirname(
+        os.__file__)
+    _run(directory, _sources(directory))
+    print()
+    _run('generated auto_all modules', [
+        ('generated_{}.py'.format(i), GENERATED_MODULE.format(i=i))
+        for i in range(GENERATED)])
+
+
+if __name__ == '__main__':
+    main()
@@ -34,12 +34,16 @@ setup(
     setup_requires=['setuptools', 'wheel'],
     tests_require=['unittest'],
     install_requires=[],
+    python_requires='>=3.8',
     data_files=[],
-    options={
-        'bdist_wheel': {'universal': True}
-    },
     url='https://github.com/jongracecox/auto-all',
     classifiers=[
-        'License :: OSI Approved :: MIT License'
+        'License :: OSI Approved :: MIT License',
+        'Programming Language :: Python :: 3 :: Only',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
+        'Programming Language :: Python :: 3.12',
     ]
 )
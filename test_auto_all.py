@@ -0,0 +1,712 @@
+"""Tests for auto_all that are too involved for the docstring examples."""
+import builtins
+import compileall
+import io
+import json
+import linecache
+import os
+import subprocess
+import sys
+import tracemalloc
+import types
+from importlib import import_module
+from importlib.machinery import SourceFileLoader
+
+import pytest
+
+from auto_all import (PublicNames, StaticAnalysisError, build_py_command,
+                      disable_cache, enable_cache, end_all, install_dir,
+                      install_import_hook, rewrite_source, start_all,
+                      scan_tree, static_all, uninstall_import_hook,
+                      _GLOBAL_VAR_NAME, _main, _read_source)
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def _write_package(directory, modules, source):
+    package = directory / 'synthetic_pkg'
+    package.mkdir()
+    (package / '__init__.py').write_text('')
+    for i in range(modules):
+        (package / 'mod{}.py'.format(i)).write_text(source)
+
+
+@pytest.fixture
+def synthetic_path(tmp_path):
+    sys.path.insert(0, str(tmp_path))
+    yield tmp_path
+    sys.path.remove(str(tmp_path))
+    for name in list(sys.modules):
+        if name.startswith('synthetic_pkg'):
+            del sys.modules[name]
+
+
+def _import_times(code):
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    result = subprocess.run(
+        [sys.executable, '-S', '-X', 'importtime', '-c', code],
+        cwd=ROOT, env=env, stderr=subprocess.PIPE, universal_newlines=True)
+    timings = {}
+    for line in result.stderr.splitlines():
+        _, cumulative, name = line.split('|')
+        if cumulative.strip().isdigit():
+            timings[name.strip()] = int(cumulative)
+    return timings
+
+
+def test_import_only_loads_sys():
+    _import_times('import auto_all')  # Write the bytecode cache
+    timings = _import_times('import auto_all')
+    assert set(timings) - set(_import_times('pass')) == {'auto_all'}
+    assert timings['auto_all'] < 5000  # microseconds
+
+
+def test_no_file_io(synthetic_path, monkeypatch):
+    _write_package(synthetic_path, 300,
+                   'from auto_all import start_all, end_all, public\n'
+                   'start_all()\n'
+                   'VALUE = 1\n'
+                   'end_all()\n'
+                   '@public\n'
+                   'def func():\n'
+                   '    pass\n')
+
+    events = []
+
+    def counting(name, func):
+        def wrapper(*args, **kwargs):
+            events.append(name)
+            return func(*args, **kwargs)
+        return wrapper
+
+    for obj, attr in [(builtins, 'open'), (io, 'open'),
+                      (linecache, 'updatecache'), (linecache, 'getlines')]:
+        monkeypatch.setattr(obj, attr, counting(attr, getattr(obj, attr)))
+    linecache.clearcache()
+
+    # The cache only applies to facade(), so it doesn't add any I/O.
+    enable_cache(str(synthetic_path / 'cache'))
+    try:
+        modules = [import_module('synthetic_pkg.mod{}'.format(i))
+                   for i in range(300)]
+    finally:
+        disable_cache()
+
+    assert events == []
+    assert linecache.cache == {}
+    assert modules[-1].__all__ == ['VALUE', 'func']
+
+
+def test_order_does_not_depend_on_hash_seed():
+    code = ('from auto_all import start_all, end_all\n'
+            'start_all()\n'
+            'zeta, alpha, mu, beta, omega = range(5)\n'
+            'end_all()\n'
+            'print(__all__)\n')
+    outputs = {
+        subprocess.check_output(
+            [sys.executable, '-c', code], cwd=ROOT,
+            env=dict(os.environ, PYTHONHASHSEED=seed),
+            universal_newlines=True)
+        for seed in ('0', '1', '42', '1234', '987654')}
+    assert outputs == {"['zeta', 'alpha', 'mu', 'beta', 'omega']\n"}
+
+
+def test_audit_events():
+    code = ('import sys\n'
+            'def hook(event, args):\n'
+            '    if event.startswith("auto_all."):\n'
+            '        print(event, args)\n'
+            'sys.addaudithook(hook)\n'
+            'from auto_all import start_all, end_all, public\n'
+            'start_all()\n'
+            'PUBLIC_VARIABLE = 1\n'
+            'end_all()\n'
+            '@public\n'
+            'def public_function():\n'
+            '    pass\n')
+    output = subprocess.check_output([sys.executable, '-c', code], cwd=ROOT,
+                                     universal_newlines=True)
+    assert output.splitlines() == ["auto_all.start_all ('__main__', 0)",
+                                   "auto_all.end_all ('__main__', 1)",
+                                   "auto_all.public ('__main__', 1)"]
+
+
+@pytest.mark.parametrize('report', ['1', 'json'])
+def test_profile_report_from_environment(report):
+    code = ('from auto_all import start_all, end_all\n'
+            'start_all()\n'
+            'PUBLIC_VARIABLE = 1\n'
+            'end_all()\n')
+    result = subprocess.run(
+        [sys.executable, '-c', code], cwd=ROOT,
+        env=dict(os.environ, AUTO_ALL_PROFILE=report),
+        stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    if report == 'json':
+        stats = json.loads(result.stderr)['__main__']
+        assert sorted(stats) == ['auto_all_time', 'block_time', 'calls',
+                                 'names']
+        assert stats['names'] == 1
+    else:
+        assert result.stderr.split()[:5] == ['module', 'calls', 'auto_all',
+                                             'ms', 'block']
+        assert '__main__' in result.stderr
+
+
+def _retained_per_module(define):
+    modules = [types.ModuleType('module_{}'.format(i)) for i in range(100)]
+    for module in modules:
+        vars(module).update(('existing_{}'.format(i), i)
+                            for i in range(1000))
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        for module in modules:
+            define(vars(module))
+        retained = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    return retained / len(modules)
+
+
+def test_no_bookkeeping_left_in_module():
+    def handwritten(globs):
+        globs['PUBLIC_VARIABLE'] = 'I am public'
+        globs['__all__'] = PublicNames(['PUBLIC_VARIABLE'])
+
+    def managed(globs):
+        start_all(globs)
+        globs['PUBLIC_VARIABLE'] = 'I am public'
+        end_all(globs)
+        assert _GLOBAL_VAR_NAME not in globs
+
+    extra = (_retained_per_module(managed)
+             - _retained_per_module(handwritten))
+    assert extra < 64  # bytes per module
+
+
+ENGINE_CASES = [
+    # Column zero text inside strings, statements split over lines.
+    '''from auto_all import start_all, end_all, public
+def f():
+    """
+def fake():
+    pass
+"""
+start_all()
+X = 1; Y = 2
+Z = (1 +
+2)
+W = 1 + \\
+3
+class A: pass
+async def g():
+    pass
+del X
+end_all()
+@public
+# comment
+@functools.lru_cache(
+    maxsize=1)
+def h():
+    return f"{X}" + f'{{'
+''',
+    # Aliases, nested blocks and decorator forms.
+    '''import auto_all as aa
+from auto_all import public as export
+if True:
+    @export
+    def inside():
+        pass
+@aa.public
+class C:
+    pass
+@export()
+def called():
+    pass
+@aa . public
+def spaced():
+    pass
+@aa.x.public
+def deep():
+    pass
+''',
+    '''from auto_all import public
+@public
+x = 1
+''',
+    '''from auto_all import auto_all
+def a(): pass
+class _B: pass
+def c(
+   x=[1,
+2]):
+    pass
+auto_all('CONST')
+''',
+    '''__all__ = ['a', 'b']
+def a(): pass
+''',
+    '''from auto_all import start_all, end_all
+start_all(exclude=['_*'])
+_a = 1
+b = 2
+if (c := 3):
+    pass
+end_all()
+''',
+    '''from auto_all import start_all, end_all
+start_all()
+from os.path import *
+end_all()
+''',
+]
+
+
+def _engine_outcome(engine, source, path):
+    try:
+        return static_all(source, path, engine)
+    except StaticAnalysisError as e:
+        return str(e)
+    except SyntaxError:
+        return SyntaxError
+
+
+@pytest.mark.parametrize('source', ENGINE_CASES)
+def test_engines_agree(source):
+    assert (_engine_outcome('fast', source, '<test>')
+            == _engine_outcome('ast', source, '<test>'))
+
+
+def test_engines_agree_on_stdlib():
+    stdlib = os.path.dirname(os.__file__)
+    paths = [os.path.join(stdlib, name) for name in sorted(os.listdir(stdlib))
+             if name.endswith('.py')]
+    disagree = []
+    for path in paths + [os.path.join(ROOT, 'auto_all.py')]:
+        try:
+            source = _read_source(path)
+        except (SyntaxError, ValueError):
+            continue
+        expected = _engine_outcome('ast', source, path)
+        if expected is SyntaxError:
+            continue
+        if _engine_outcome('fast', source, path) != expected:
+            disagree.append(path)
+    assert disagree == []
+
+
+@pytest.mark.parametrize('engine', ['ast', 'fast'])
+def test_unresolvable_constructs_ignored_without_auto_all(engine):
+    assert static_all('from os.path import *\n', engine=engine) is None
+    if sys.version_info >= (3, 10):
+        source = 'match x:\n    case 1:\n        pass\n'
+        assert static_all(source, engine=engine) is None
+
+
+@pytest.mark.parametrize('engine', ['ast', 'fast'])
+def test_unresolvable_constructs_in_auto_all_module(engine):
+    source = ('from os.path import *\n'
+              'from auto_all import public\n'
+              '@public\n'
+              'def func():\n'
+              '    pass\n')
+    with pytest.raises(StaticAnalysisError, match='wildcard'):
+        static_all(source, engine=engine)
+
+
+def test_facade_skips_unrelated_submodules(synthetic_path):
+    package = synthetic_path / 'synthetic_pkg'
+    package.mkdir()
+    (package / '__init__.py').write_text(
+        'import auto_all\nauto_all.facade()\n')
+    (package / 'api.py').write_text(
+        'from auto_all import public\n@public\ndef thing():\n    pass\n')
+    (package / 'star.py').write_text('from os.path import *\n')
+    (package / 'broken.py').write_text('def (\n__all__ = []\n')
+    (package / 'latin1.py').write_bytes(b'__all__ = ["\xe9"]\n')
+
+    module = import_module('synthetic_pkg')
+    assert module.__all__ == ['thing']
+
+
+def test_facade_raises_for_listed_submodules(synthetic_path):
+    package = synthetic_path / 'synthetic_pkg'
+    package.mkdir()
+    (package / '__init__.py').write_text(
+        'import auto_all\nauto_all.facade(".broken")\n')
+    (package / 'broken.py').write_text('def (\n__all__ = []\n')
+
+    with pytest.raises(SyntaxError):
+        import_module('synthetic_pkg')
+
+
+@pytest.mark.parametrize('engine', ['ast', 'fast'])
+def test_scan_tree_ignores_unrelated_wildcard_imports(tmp_path, engine):
+    (tmp_path / 'api.py').write_text(
+        'from auto_all import public\n@public\ndef thing():\n    pass\n')
+    (tmp_path / 'star.py').write_text('from os.path import *\n')
+
+    records = list(scan_tree(str(tmp_path), workers=0, errors='raise',
+                             engine=engine))
+    assert records == [('api', 'thing', 'function', 3)]
+
+
+def test_scan_tree_skips_errors_by_default(tmp_path):
+    (tmp_path / 'broken.py').write_text('def (\n')
+    with pytest.warns(RuntimeWarning, match='skipped .*broken.py'):
+        assert list(scan_tree(str(tmp_path), workers=0, engine='ast')) == []
+    with pytest.raises(SyntaxError):
+        list(scan_tree(str(tmp_path), workers=0, errors='raise',
+                       engine='ast'))
+
+
+def test_lazy_end_all_ignores_later_deletions():
+    module = types.ModuleType('lazy_module')
+    start_all(vars(module))
+    module.api = 1
+    module._tmp = 1
+    end_all(vars(module), lazy=True)
+    del module._tmp
+    module.private_helper = 2
+    assert module.__all__ == ['api']
+
+
+def test_auto_all_includes_decorated_functions():
+    source = ('import functools\n'
+              'from auto_all import auto_all\n'
+              '@functools.lru_cache()\n'
+              'def cached():\n'
+              '    pass\n'
+              'def plain():\n'
+              '    pass\n'
+              'auto_all()\n')
+    module = types.ModuleType('decorated')
+    exec(source, vars(module))
+    assert module.__all__ == ['cached', 'plain']
+    assert module.__all__ == static_all(source)
+
+
+def test_install_dir_before_any_public_names():
+    module = types.ModuleType('no_public_names')
+    install_dir(vars(module))
+    assert dir(module) == []
+
+
+def _hooked_import(name):
+    finder = install_import_hook(['synthetic_pkg'])
+    try:
+        return import_module(name)
+    finally:
+        uninstall_import_hook(finder)
+        for module in list(sys.modules):
+            if module.startswith('synthetic_pkg'):
+                del sys.modules[module]
+
+
+def test_import_hook_only_rewrites_auto_all_modules(synthetic_path,
+                                                    monkeypatch):
+    monkeypatch.setattr(sys, 'dont_write_bytecode', False)
+    package = synthetic_path / 'synthetic_pkg'
+    package.mkdir()
+    (package / '__init__.py').write_text('')
+    (package / 'plain.py').write_text('VALUE = 1\n')
+    (package / 'api.py').write_text(
+        'from auto_all import start_all, end_all\n'
+        'start_all()\nVALUE = 1\nend_all()\n')
+    # Standard bytecode compiled without the hook, as pip does.
+    compileall.compile_dir(str(package), quiet=1)
+
+    for _ in range(2):
+        assert not hasattr(_hooked_import('synthetic_pkg.api'), 'start_all')
+        assert _hooked_import('synthetic_pkg.plain').VALUE == 1
+    cache = package / '__pycache__'
+    tag = sys.implementation.cache_tag
+    assert sorted(os.listdir(str(cache))) == [
+        '__init__.{}.auto-all.pyc'.format(tag),
+        '__init__.{}.pyc'.format(tag),
+        'api.{}.auto-all.pyc'.format(tag),
+        'api.{}.pyc'.format(tag),
+        'plain.{}.auto-all.pyc'.format(tag),
+        'plain.{}.pyc'.format(tag)]
+    assert (cache / 'plain.{}.auto-all.pyc'.format(tag)).read_bytes() == b''
+
+    # Cached imports don't read the source again.
+    read = []
+    get_data = SourceFileLoader.get_data
+
+    def recording_get_data(self, path):
+        read.append(path)
+        return get_data(self, path)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(SourceFileLoader, 'get_data', recording_get_data)
+        _hooked_import('synthetic_pkg.api')
+        _hooked_import('synthetic_pkg.plain')
+    assert read and not [path for path in read if path.endswith('.py')]
+
+    # A module that stops using auto_all goes back to the standard .pyc.
+    (package / 'api.py').write_text('VALUE = 2\n')
+    os.utime(str(package / 'api.py'), (0, 0))
+    assert _hooked_import('synthetic_pkg.api').VALUE == 2
+    assert (cache / 'api.{}.auto-all.pyc'.format(tag)).read_bytes() == b''
+
+
+def test_build_py_command_rewrites_modules(tmp_path, monkeypatch):
+    dist = pytest.importorskip('setuptools.dist')
+    package = tmp_path / 'src' / 'built_pkg'
+    package.mkdir(parents=True)
+    (package / '__init__.py').write_text('')
+    (package / 'api.py').write_text(
+        'from auto_all import start_all, end_all\n'
+        'start_all()\n'
+        'def func():\n'
+        '    pass\n'
+        'VALUE = 1\n'
+        'end_all()\n')
+    monkeypatch.chdir(str(tmp_path))
+
+    distribution = dist.Distribution({
+        'script_name': 'setup.py', 'packages': ['built_pkg'],
+        'package_dir': {'': 'src'},
+        'cmdclass': {'build_py': build_py_command()}})
+    command = distribution.get_command_obj('build_py')
+    command.build_lib = 'build'
+    distribution.run_command('build_py')
+
+    built = (tmp_path / 'build' / 'built_pkg' / 'api.py').read_text()
+    assert 'auto_all' not in built
+    output = subprocess.check_output(
+        [sys.executable, '-c',
+         'import sys\n'
+         "sys.modules['auto_all'] = None\n"
+         'import built_pkg.api\n'
+         'print(built_pkg.api.__all__)\n'],
+        cwd=str(tmp_path / 'build'), universal_newlines=True)
+    assert output == "('func', 'VALUE')\n"
+
+
+def test_cache_detects_edits_with_same_size_and_mtime(synthetic_path):
+    package = synthetic_path / 'synthetic_pkg'
+    package.mkdir()
+    (package / '__init__.py').write_text(
+        'import auto_all\nauto_all.facade()\n')
+    source = package / 'api.py'
+    source.write_text('__all__ = ["A"]\n')
+
+    def import_package():
+        for name in list(sys.modules):
+            if name.startswith('synthetic_pkg'):
+                del sys.modules[name]
+        return import_module('synthetic_pkg').__all__
+
+    enable_cache(str(synthetic_path / 'cache'))
+    try:
+        assert import_package() == ['A']
+        assert len(os.listdir(str(synthetic_path / 'cache'))) == 1
+        stat = os.stat(str(source))
+        source.write_text('__all__ = ["B"]\n')
+        os.utime(str(source), ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        assert import_package() == ['B']
+    finally:
+        disable_cache()
+
+
+CONDITIONAL_CASES = [
+    ('try:\n'
+     '    from _no_such_accel import speedup\n'
+     'except ImportError:\n'
+     '    pass\n', 'speedup'),
+    ('if sys.version_info < (3, 0):\n'
+     '    def legacy():\n'
+     '        pass\n', 'legacy'),
+    ('for item in []:\n'
+     '    pass\n', 'item'),
+    ('with contextlib.suppress(ImportError):\n'
+     '    from _no_such_accel import speedup\n', 'speedup'),
+    ('if sys.platform:\n'
+     '    del VALUE\n', 'VALUE'),
+]
+
+
+def _block(body, name='start_all()'):
+    return ('import contextlib, sys\n'
+            'from auto_all import start_all, end_all\n'
+            '{}\nVALUE = 1\n{}end_all()\n'.format(name, body))
+
+
+@pytest.mark.parametrize('engine', ['ast', 'fast'])
+@pytest.mark.parametrize('body, name', CONDITIONAL_CASES)
+def test_conditionally_bound_names_are_unresolvable(engine, body, name):
+    with pytest.raises(StaticAnalysisError, match=repr(name)):
+        static_all(_block(body), engine=engine)
+
+
+@pytest.mark.parametrize('engine', ['ast', 'fast'])
+def test_names_bound_in_every_branch_are_resolved(engine):
+    body = ('try:\n'
+            '    from _no_such_accel import speedup\n'
+            'except ImportError:\n'
+            '    def speedup():\n'
+            '        pass\n'
+            'if sys.platform:\n'
+            '    _compat = 1\n'
+            'for _item in []:\n'
+            '    pass\n')
+    source = _block(body, 'start_all(exclude_private=True)')
+    assert static_all(source, engine=engine) == ['VALUE', 'speedup']
+    module = types.ModuleType('branches')
+    exec(source, vars(module))
+    assert module.__all__ == ['VALUE', 'speedup']
+
+
+@pytest.mark.parametrize('engine', ['ast', 'fast'])
+def test_conditional_auto_all_calls_are_unresolvable(engine):
+    source = ('import sys\n'
+              'from auto_all import public\n'
+              'if sys.platform:\n'
+              '    @public\n'
+              '    def func():\n'
+              '        pass\n')
+    with pytest.raises(StaticAnalysisError, match='conditional @public'):
+        static_all(source, engine=engine)
+
+
+def test_rewrite_source_leaves_conditional_names_to_runtime():
+    source = _block('try:\n'
+                    '    from _no_such_accel import speedup\n'
+                    'except ImportError:\n'
+                    '    pass\n')
+    assert rewrite_source(source) is None
+
+
+def test_import_hook_star_import_with_optional_import(synthetic_path):
+    package = synthetic_path / 'synthetic_pkg'
+    package.mkdir()
+    (package / '__init__.py').write_text('')
+    (package / 'opt.py').write_text(_block(
+        'try:\n'
+        '    from _no_such_accel import speedup\n'
+        'except ImportError:\n'
+        '    pass\n'))
+
+    finder = install_import_hook(['synthetic_pkg'])
+    try:
+        namespace = {}
+        exec('from synthetic_pkg.opt import *', namespace)
+    finally:
+        uninstall_import_hook(finder)
+    assert sys.modules['synthetic_pkg.opt'].__all__ == ['VALUE']
+    assert 'speedup' not in namespace
+
+
+@pytest.mark.parametrize('engine', ['ast', 'fast'])
+@pytest.mark.parametrize('statement, name', [
+    ("Point = collections.namedtuple('Point', 'x y')\n", 'Point'),
+    ('Alias = helper\n', 'Alias'),
+    ('handler = lambda: None\n', 'handler'),
+    ('@decorator\ndef wrapped():\n    pass\n', 'wrapped'),
+])
+def test_auto_all_values_that_cannot_be_classified(engine, statement, name):
+    source = ('import collections\n'
+              'from auto_all import auto_all\n'
+              'def decorator(func):\n'
+              '    return func\n'
+              'def helper():\n'
+              '    pass\n'
+              '{}auto_all()\n'.format(statement))
+    with pytest.raises(StaticAnalysisError, match=repr(name)):
+        static_all(source, engine=engine)
+    assert rewrite_source(source) is None
+
+
+@pytest.mark.parametrize('engine', ['ast', 'fast'])
+def test_auto_all_static_and_runtime_agree(engine):
+    source = ('import contextlib\n'
+              'import logging\n'
+              'from functools import lru_cache\n'
+              'from auto_all import auto_all\n'
+              '_log = logging.getLogger(__name__)\n'
+              "VERSION = '1.' + '0'\n"
+              '@lru_cache(maxsize=None)\n'
+              'def cached():\n'
+              '    pass\n'
+              '@contextlib.contextmanager\n'
+              'def managed():\n'
+              '    yield\n'
+              'auto_all()\n')
+    module = types.ModuleType('agree')
+    exec(source, vars(module))
+    assert module.__all__ == ['cached', 'managed']
+    assert static_all(source, engine=engine) == module.__all__
+
+
+CLI_MODULE = ('from auto_all import start_all, end_all\n'
+              'start_all()\n'
+              'VALUE = 1\n'
+              'def func():\n'
+              '    pass\n'
+              'end_all()\n')
+
+CLI_UNANALYSABLE = ('import re\n'
+                    'from auto_all import start_all, end_all\n'
+                    "start_all(exclude=re.compile('^_'))\n"
+                    'VALUE = 1\n'
+                    'end_all()\n')
+
+
+def test_main_prints_all(tmp_path, capsys):
+    module = tmp_path / 'module.py'
+    module.write_text(CLI_MODULE)
+    assert _main([str(module)]) == 0
+    assert capsys.readouterr().out == "__all__ = ['VALUE', 'func']\n"
+
+
+def test_main_json_output_file(tmp_path, capsys):
+    module = tmp_path / 'module.py'
+    module.write_text(CLI_MODULE)
+    output = tmp_path / 'all.json'
+    assert _main(['--json', '-o', str(output), str(module)]) == 0
+    assert capsys.readouterr().out == ''
+    assert json.loads(output.read_text()) == {str(module): ['VALUE', 'func']}
+
+
+def test_main_exits_on_static_analysis_error(tmp_path, capsys):
+    module = tmp_path / 'module.py'
+    module.write_text(CLI_UNANALYSABLE)
+    with pytest.raises(SystemExit) as exit_info:
+        _main([str(module)])
+    assert exit_info.value.code == 1
+    assert 'cannot resolve exclude rules' in capsys.readouterr().err
+
+
+def test_main_records(tmp_path, capsys):
+    package = tmp_path / 'package'
+    package.mkdir()
+    (package / '__init__.py').write_text('')
+    (package / 'module.py').write_text(CLI_MODULE)
+    assert _main(['--records', '-j', '1', str(package)]) == 0
+    records = [json.loads(line)
+               for line in capsys.readouterr().out.splitlines()]
+    assert records == [['package.module', 'VALUE', 'variable', 3],
+                       ['package.module', 'func', 'function', 4]]
+
+
+def test_main_records_warns_about_skipped_files(tmp_path, capsys):
+    (tmp_path / 'bad.py').write_text(CLI_UNANALYSABLE)
+    (tmp_path / 'good.py').write_text(CLI_MODULE)
+    assert _main(['--records', '-j', '2', str(tmp_path)]) == 0
+    captured = capsys.readouterr()
+    assert len(captured.out.splitlines()) == 2
+    assert captured.err == 'warning: skipped {}: {}:3: {}\n'.format(
+        tmp_path / 'bad.py', tmp_path / 'bad.py',
+        'cannot resolve exclude rules')
+
+
+def test_main_records_strict(tmp_path, capsys):
+    (tmp_path / 'bad.py').write_text(CLI_UNANALYSABLE)
+    with pytest.raises(SystemExit) as exit_info:
+        _main(['--records', '--strict', '-j', '1', str(tmp_path)])
+    assert exit_info.value.code == 1
+    assert 'cannot resolve exclude rules' in capsys.readouterr().err